@@ -0,0 +1,310 @@
+"""
+Record/replay fixtures of li.quest responses.
+
+A fixture is a JSON file:
+
+    {
+        "version": 1,
+        "responses": [
+            {"path": "/v1/quote", "params": {...}, "status": 200, "body": {...}},
+            {"path": "/v1/advanced/routes", "params": {JSON body}, "status": 200, "body": {...}},
+            ...
+        ]
+    }
+
+Record real responses with
+
+    python -m benchmarks.fixtures record fixtures.json --pair Ethereum:Arbitrum:WBTC:1 ...
+
+(needs network access and an API key), or generate an offline one with
+synthetic_fixture().
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import argparse
+import hashlib
+import json
+import threading
+
+
+FIXTURE_VERSION = 1
+
+
+########################################
+### MATCHING
+########################################
+
+def match_key(path, params):
+    """
+    Key under which a request is replayed. Quotes and routes ignore the amount (the
+    mock server rescales the recorded quote), tokens and symbols are case-insensitive.
+    """
+    if path == "/v1/advanced/routes":
+        params = params or {}
+        options = params.get("options")
+        return (path, str(params.get("fromChainId")), str(params.get("toChainId")),
+                str(params.get("fromTokenAddress", "")).lower(), str(params.get("toTokenAddress", "")).lower(),
+                options.get("order", "CHEAPEST") if isinstance(options, dict) else "CHEAPEST")
+    params = {k: str(v) for k, v in (params or {}).items()}
+    if path == "/v1/quote":
+        return (path, params.get("fromChain"), params.get("toChain"),
+                params.get("fromToken", "").lower(), params.get("toToken", "").lower(),
+                params.get("order", "CHEAPEST"))
+    if path == "/v1/token":
+        return (path, params.get("chain"), params.get("token", "").lower())
+    if path == "/v1/tokens":
+        return (path, params.get("chains"))
+    return (path,)
+
+
+class Fixture:
+
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self._index = {}
+        for entry in self.responses:
+            self._index[match_key(entry["path"], entry["params"])] = entry
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"Unsupported fixture version {data.get('version')}")
+        return cls(data["responses"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"version": FIXTURE_VERSION, "responses": self.responses}, f, indent=1)
+
+    def add(self, path, params, status, body):
+        entry = {
+            "path": path, "params": {k: v if isinstance(v, dict) else str(v) for k, v in (params or {}).items()},
+            "status": status, "body": body,
+        }
+        self.responses.append(entry)
+        self._index[match_key(path, params)] = entry
+
+    def lookup(self, path, params):
+        """Recorded (status, body) for a request, or None."""
+        if path == "/v1/tokens":
+            return self._lookup_tokens(params)
+        entry = self._index.get(match_key(path, params))
+        if entry is None:
+            if path == "/v1/advanced/routes":
+                return self._lookup_routes(params)
+            return None
+        if path == "/v1/quote" and entry["status"] == 200:
+            return 200, _rescale_quote(entry["body"], int(params["fromAmount"]))
+        if path == "/v1/advanced/routes" and entry["status"] == 200:
+            return 200, _rescale_routes(entry["body"], int(params["fromAmount"]))
+        return entry["status"], entry["body"]
+
+    def _lookup_routes(self, body):
+        # Not recorded: the direct quote, if any, is the only route
+        options = body.get("options")
+        quote = self.lookup("/v1/quote", {
+            "fromChain": body.get("fromChainId"), "toChain": body.get("toChainId"),
+            "fromToken": body.get("fromTokenAddress", ""), "toToken": body.get("toTokenAddress", ""),
+            "fromAmount": body.get("fromAmount", 0),
+            "order": options.get("order", "CHEAPEST") if isinstance(options, dict) else "CHEAPEST",
+        })
+        if quote is None or quote[0] != 200:
+            return 200, {"routes": []}
+        step = quote[1]
+        action = {**step["action"], "fromChainId": int(body["fromChainId"]), "toChainId": int(body["toChainId"])}
+        return 200, {"routes": [{
+            "fromChainId": action["fromChainId"], "toChainId": action["toChainId"],
+            "fromAmount": step["estimate"]["fromAmount"], "toAmount": step["estimate"]["toAmount"],
+            "steps": [{**step, "type": "lifi", "action": action}],
+            "tags": ["RECOMMENDED"],
+        }]}
+
+    def _lookup_tokens(self, params):
+        # Token lists may have been recorded one chain at a time
+        tokens = {}
+        for chain in str(params.get("chains", "")).split(","):
+            entry = self._index.get(("/v1/tokens", chain))
+            if entry is None or entry["status"] != 200:
+                return None
+            tokens.update(entry["body"].get("tokens", {}))
+        return 200, {"tokens": tokens}
+
+
+def _rescale_quote(body, from_amount):
+    """Replay a recorded quote for another amount, at the same rate."""
+    estimate = body["estimate"]
+    recorded = int(estimate["fromAmount"]) or 1
+    return {
+        **body,
+        "estimate": {
+            **estimate,
+            "fromAmount": str(from_amount),
+            "toAmount": str(int(int(estimate["toAmount"]) * from_amount / recorded)),
+        },
+    }
+
+
+def _rescale_routes(body, from_amount):
+    """Replay recorded routes for another amount, every step at the same rate."""
+    routes = []
+    for route in body.get("routes", []):
+        recorded = int(route["fromAmount"]) or 1
+        ratio = from_amount / recorded
+        routes.append({
+            **route,
+            "fromAmount": str(from_amount),
+            "toAmount": str(int(int(route["toAmount"]) * ratio)),
+            "steps": [
+                {**step, "estimate": {
+                    **step["estimate"],
+                    "fromAmount": str(int(int(step["estimate"]["fromAmount"]) * ratio)),
+                    "toAmount": str(int(int(step["estimate"]["toAmount"]) * ratio)),
+                }}
+                for step in route["steps"]
+            ],
+        })
+    return {**body, "routes": routes}
+
+
+########################################
+### RECORDING
+########################################
+
+class Recorder:
+    """Response hook for routing.route_finder.response_hooks that fills a Fixture."""
+
+    def __init__(self, fixture=None):
+        self.fixture = fixture or Fixture()
+        self._lock = threading.Lock()
+
+    def __call__(self, path, params, response):
+        try:
+            body = response.json()
+        except ValueError:
+            return
+        # Throttling and server errors are not part of the recorded behaviour
+        if response.status_code == 429 or response.status_code >= 500:
+            return
+        with self._lock:
+            self.fixture.add(path, params, response.status_code, body)
+
+
+def record(output, pairs, orders=("CHEAPEST",)):
+    """
+    Run find_best_routes_parallel on the live API for `pairs`, with the hand-built
+    strategies and in multi-route mode, and save every response.
+    """
+    from routing import route_finder
+
+    recorder = Recorder()
+    route_finder.response_hooks.append(recorder)
+    try:
+        for src_chain, dst_chain, token, amount in pairs:
+            for order in orders:
+                route_finder.find_best_routes_parallel(src_chain, dst_chain, token, token, amount, order, fresh=True)
+                route_finder.find_best_routes_parallel(src_chain, dst_chain, token, token, amount, order, fresh=True,
+                                                       multi_route=True)
+    finally:
+        route_finder.response_hooks.remove(recorder)
+    recorder.fixture.save(output)
+    return recorder.fixture
+
+
+########################################
+### SYNTHETIC FIXTURE
+########################################
+
+# chain_id -> (symbol, decimals, priceUSD) of the tokens in the offline fixture
+SYNTHETIC_TOKENS = {
+    1: [("WBTC", 8, 60000), ("ETH", 18, 3000), ("WETH", 18, 3000), ("USDC", 6, 1)],
+    10: [("WBTC", 8, 60000), ("ETH", 18, 3000), ("USDC", 6, 1)],
+    137: [("WBTC", 8, 60000), ("ETH", 18, 3000), ("USDC", 6, 1)],
+    8453: [("WBTC", 8, 60000), ("ETH", 18, 3000), ("USDC", 6, 1)],
+    42161: [("WBTC", 8, 60000), ("ETH", 18, 3000), ("USDC", 6, 1)],
+}
+NATIVE_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def _synthetic_address(chain_id, symbol):
+    if symbol == "ETH":
+        return NATIVE_ADDRESS
+    return "0x" + hashlib.sha1(f"{chain_id}:{symbol}".encode()).hexdigest()
+
+
+def synthetic_fixture(tokens=SYNTHETIC_TOKENS, swap_efficiency=0.997, bridge_efficiency=0.99, duration=30):
+    """
+    Build an offline fixture covering every token pair of `tokens`: same-chain swaps
+    keep `swap_efficiency` of the value, bridges `bridge_efficiency`.
+    """
+    fixture = Fixture()
+    entries = {}
+    for chain_id, chain_tokens in tokens.items():
+        listed = []
+        for symbol, decimals, price in chain_tokens:
+            token = {
+                "chainId": chain_id, "symbol": symbol, "decimals": decimals,
+                "address": _synthetic_address(chain_id, symbol), "priceUSD": str(price),
+            }
+            listed.append(token)
+            entries[(chain_id, symbol)] = token
+            fixture.add("/v1/token", {"chain": chain_id, "token": symbol}, 200, token)
+        fixture.add("/v1/tokens", {"chains": chain_id}, 200, {"tokens": {str(chain_id): listed}})
+
+    for (from_chain, _), from_token in entries.items():
+        for (to_chain, _), to_token in entries.items():
+            if from_token is to_token:
+                continue
+            efficiency = swap_efficiency if from_chain == to_chain else bridge_efficiency
+            from_amount = 10 ** from_token["decimals"]
+            to_amount = float(from_token["priceUSD"]) / float(to_token["priceUSD"]) * efficiency
+            for order in ("CHEAPEST", "FASTEST"):
+                fixture.add("/v1/quote", {
+                    "fromChain": from_chain, "toChain": to_chain,
+                    "fromToken": from_token["address"], "toToken": to_token["address"],
+                    "fromAmount": from_amount, "order": order,
+                }, 200, {
+                    "tool": "synthetic" if from_chain == to_chain else "synthetic-bridge",
+                    "action": {"fromToken": from_token, "toToken": to_token},
+                    "estimate": {
+                        "fromAmount": str(from_amount),
+                        "toAmount": str(int(to_amount * 10 ** to_token["decimals"])),
+                        "executionDuration": duration,
+                    },
+                })
+    return fixture
+
+
+def parse_pair(text):
+    """'Ethereum:Arbitrum:WBTC:1' -> ("Ethereum", "Arbitrum", "WBTC", 1.0)"""
+    src_chain, dst_chain, token, amount = text.split(":")
+    return src_chain, dst_chain, token, float(amount)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or generate li.quest fixtures.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_cmd = commands.add_parser("record", help="record live responses (needs network)")
+    record_cmd.add_argument("output")
+    record_cmd.add_argument("--pair", action="append", type=parse_pair, required=True,
+                            help="src_chain:dst_chain:token:amount, repeatable")
+    record_cmd.add_argument("--order", action="append", default=None, choices=["CHEAPEST", "FASTEST"])
+
+    synthetic_cmd = commands.add_parser("synthetic", help="write the offline synthetic fixture")
+    synthetic_cmd.add_argument("output")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        fixture = record(args.output, args.pair, args.order or ["CHEAPEST"])
+    else:
+        fixture = synthetic_fixture()
+        fixture.save(args.output)
+    print(f"{len(fixture.responses)} responses written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Load test of the route finder with many concurrent users, against the local mock li.quest server.
+
+    python -m benchmarks.load --users 1,4,16,64 --duration 10 --think-ms 500 --latency lognormal:150,0.4
+
+Each simulated user is a thread that waits a random think time (exponential, mean
+--think-ms), then routes a random pair at a random amount, like a Streamlit session.
+For every number of users the report gives query latency percentiles, throughput,
+the mean and peak queueing on the shared route executor and the rate limiter state,
+then the saturation point: the first level where more users no longer bring more
+throughput, only more latency.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+
+from benchmarks.fixtures import Fixture, parse_pair, synthetic_fixture
+from benchmarks.mock_server import ErrorModel, LatencyModel, MockLifiServer
+from benchmarks.run import DEFAULT_PAIRS, VARIANTS, _ms, percentile, reset_state, warm_tokens
+
+
+SATURATION_GAIN = 1.1   # a level saturates when it brings less than 10% more throughput
+
+
+########################################
+### FUNCTIONS
+########################################
+
+def run_level(route_finder, route_executor, pairs, users, duration, think_ms, variant, use_cache=False):
+    """Run `users` simulated users for `duration` seconds, return the level metrics."""
+    reset_state(route_finder)
+    before = route_executor.stats()
+    route_executor.peak_queued = 0
+    route_executor.peak_threads = before["threads"]
+
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    started = time.perf_counter()
+    end = started + duration
+
+    def user(seed):
+        nonlocal failures
+        rng = random.Random(seed)
+        while True:
+            think = rng.expovariate(1000 / think_ms) if think_ms else 0
+            if time.perf_counter() + think >= end:
+                return
+            time.sleep(think)
+            src_chain, dst_chain, token, amount = rng.choice(pairs)
+            amount *= math.exp(rng.uniform(-1, 1))  # distinct amounts, no accidental coalescing
+            start = time.perf_counter()
+            try:
+                result = route_finder.find_best_routes_parallel(
+                    src_chain, dst_chain, token, token, amount, "CHEAPEST",
+                    fresh=not use_cache, **VARIANTS[variant]
+                )
+                ok = bool(result.get("best"))
+            except Exception:
+                ok = False
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    failures += 1
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    after = route_executor.stats()
+    tasks = after["completed"] - before["completed"]
+    queued = after["queue_seconds"] - before["queue_seconds"]
+    return {
+        "users": users,
+        "queries": len(latencies),
+        "failures": failures,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "throughput_qps": round(len(latencies) / wall, 2),
+        "tasks": tasks,
+        "queue_ms": _ms(queued / tasks) if tasks else None,
+        "peak_queued": after["peak_queued"],
+        "peak_threads": after["peak_threads"],
+        "limiter_rate": route_finder.rate_limiter.stats()["rate"],
+    }
+
+
+def saturation_point(rows):
+    """Users of the last level that still raised throughput by SATURATION_GAIN, or None if none stopped."""
+    for previous, row in zip(rows, rows[1:]):
+        if row["throughput_qps"] < previous["throughput_qps"] * SATURATION_GAIN:
+            return previous["users"]
+    return None
+
+
+def print_table(rows):
+    columns = ["users", "queries", "p50_ms", "p95_ms", "p99_ms", "throughput_qps", "queue_ms", "peak_queued",
+               "peak_threads", "limiter_rate", "failures"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the route finder against a local mock li.quest.")
+    parser.add_argument("--fixture", help="recorded fixture JSON (synthetic fixture if omitted)")
+    parser.add_argument("--pair", action="append", type=parse_pair, help="src_chain:dst_chain:token:amount, repeatable")
+    parser.add_argument("--variant", default="default", choices=sorted(VARIANTS))
+    parser.add_argument("--users", default="1,2,4,8,16,32,64", help="comma separated numbers of concurrent users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean think time between two queries of a user")
+    parser.add_argument("--latency", default="lognormal:150,0.4", help="mock latency model, see LatencyModel")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--use-cache", action="store_true", help="let queries hit the quote cache")
+    parser.add_argument("--workers", type=int, help="size of the shared route executor (ROUTE_WORKERS if omitted)")
+    parser.add_argument("--rate-limit", type=float, help="starting rate of the li.quest rate limiter (production default if omitted)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    fixture = Fixture.load(args.fixture) if args.fixture else synthetic_fixture()
+    server = MockLifiServer(
+        fixture, latency=LatencyModel(args.latency),
+        errors=ErrorModel(args.error_rate, throttle_rate=args.throttle_rate)
+    ).start()
+
+    from routing import route_finder
+    from routing.config import configure
+    from routing.scheduler import route_executor
+    configure(base_url=server.url)
+    if args.rate_limit:
+        route_finder.rate_limiter = route_finder.AdaptiveRateLimiter(rate=args.rate_limit, burst=max(1, int(args.rate_limit)))
+    if args.workers:
+        route_executor.max_workers = args.workers
+
+    pairs = args.pair or [parse_pair(p) for p in DEFAULT_PAIRS]
+    warm_tokens(route_finder, pairs)
+    rows = []
+    for users in (int(u) for u in args.users.split(",")):
+        rows.append(run_level(route_finder, route_executor, pairs, users, args.duration, args.think_ms,
+                              args.variant, args.use_cache))
+        print(f"{users} users: {rows[-1]['throughput_qps']} q/s, p95 {rows[-1]['p95_ms']} ms", flush=True)
+
+    server.shutdown()
+    print_table(rows)
+    saturated = saturation_point(rows)
+    if saturated is None:
+        print("No saturation within the tested levels.")
+    else:
+        print(f"Throughput saturates at about {saturated} concurrent users.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"levels": rows, "saturation_users": saturated}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
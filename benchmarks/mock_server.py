@@ -0,0 +1,180 @@
+"""
+Local mock of the li.quest API replaying a fixture (see benchmarks/fixtures.py).
+
+    python -m benchmarks.mock_server fixtures.json --port 8900 --latency lognormal:120,0.5 --error-rate 0.01
+
+Point the route finder at it with LIFI_BASE_URL=http://127.0.0.1:8900.
+Requests missing from the fixture get li.quest's 404 "No available quotes"; multi-route
+requests (POST /v1/advanced/routes) not in the fixture get the direct quote as only route.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from benchmarks.fixtures import Fixture, synthetic_fixture
+
+
+########################################
+### DISTRIBUTIONS
+########################################
+
+class LatencyModel:
+    """
+    Response latency in seconds, from a spec string:
+        fixed:MS            always MS milliseconds
+        uniform:LOW,HIGH    uniform between LOW and HIGH ms
+        lognormal:MEDIAN,SIGMA
+    """
+
+    def __init__(self, spec="fixed:0"):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v]
+        if kind == "fixed":
+            self._sample = lambda: values[0] / 1000
+        elif kind == "uniform":
+            self._sample = lambda: random.uniform(values[0], values[1]) / 1000
+        elif kind == "lognormal":
+            median, sigma = values
+            self._sample = lambda: random.lognormvariate(0, sigma) * median / 1000
+        else:
+            raise ValueError(f"Unknown latency model '{spec}'")
+
+    def sample(self):
+        return self._sample()
+
+
+class ErrorModel:
+    """Random failures: `error_rate` of 5xx (`error_status`) and `throttle_rate` of 429."""
+
+    def __init__(self, error_rate=0.0, error_status=503, throttle_rate=0.0, retry_after=1):
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+
+    def sample(self):
+        """Return (status, headers) of an injected failure, or None."""
+        draw = random.random()
+        if draw < self.throttle_rate:
+            return 429, {"Retry-After": str(self.retry_after)}
+        if draw < self.throttle_rate + self.error_rate:
+            return self.error_status, {}
+        return None
+
+
+########################################
+### SERVER
+########################################
+
+class MockLifiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixture, address=("127.0.0.1", 0), latency=None, errors=None):
+        super().__init__(address, _Handler)
+        self.fixture = fixture
+        self.latency = latency or LatencyModel()
+        self.errors = errors or ErrorModel()
+        self.calls = Counter()  # path -> requests served
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, path):
+        with self._lock:
+            self.calls[path] += 1
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls.clear()
+
+    def start(self):
+        """Serve from a background thread, returns self."""
+        threading.Thread(target=self.serve_forever, name="mock-lifi", daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._serve(url.path, dict(parse_qsl(url.query)))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"message": "Invalid JSON body"})
+            return
+        self._serve(url.path, body)
+
+    def _serve(self, path, params):
+        server = self.server
+        server.count(path)
+
+        time.sleep(server.latency.sample())
+
+        failure = server.errors.sample()
+        if failure is not None:
+            status, headers = failure
+            self._reply(status, {"message": "injected failure"}, headers)
+            return
+
+        found = server.fixture.lookup(path, params)
+        if found is None:
+            self._reply(404, {"message": "No available quotes for the requested transfer"})
+        else:
+            self._reply(*found)
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would drown the benchmark output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a li.quest fixture locally.")
+    parser.add_argument("fixture", nargs="?", help="fixture JSON (synthetic fixture if omitted)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:MS, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    fixture = Fixture.load(args.fixture) if args.fixture else synthetic_fixture()
+    server = MockLifiServer(
+        fixture, (args.host, args.port), LatencyModel(args.latency),
+        ErrorModel(args.error_rate, args.error_status, args.throttle_rate)
+    )
+    print(f"Mock li.quest serving {len(fixture.responses)} responses on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Offline benchmark of find_best_routes_parallel against the local mock li.quest server.
+
+    python -m benchmarks.run --latency lognormal:150,0.4 --concurrency 1,4,16 --queries 40
+
+Runs every (chain pair, engine variant, concurrency) cell of the matrix and reports
+p50/p95/p99 query latency, the p50 completion time of each strategy, upstream calls
+per query and throughput. No network access is needed: the mock server replays a
+recorded fixture (--fixture) or the synthetic one.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import Fixture, parse_pair, synthetic_fixture
+from benchmarks.mock_server import ErrorModel, LatencyModel, MockLifiServer
+
+
+DEFAULT_PAIRS = [
+    "Ethereum:Arbitrum:WBTC:1",
+    "Ethereum:Optimism:USDC:5000",
+    "Polygon:Arbitrum:WBTC:0.5",
+]
+
+# Engine variants, as extra find_best_routes_parallel arguments
+VARIANTS = {
+    "default": {},
+    "speculative": {"speculative": True},
+    "pruned": {"prune": True},
+    "multi_route": {"multi_route": True},
+    "planner": {"planner": True},
+}
+
+
+########################################
+### FUNCTIONS
+########################################
+
+def percentile(values, pct):
+    """Nearest-rank percentile, None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def reset_state(route_finder):
+    """Forget the quotes, routes and failures of the previous cell, so cells don't skew each other."""
+    route_finder.quote_cache.clear()
+    route_finder.routes_cache.clear()
+    route_finder.failure_cache.clear()
+    route_finder.circuit_breaker.reset()
+
+
+def warm_tokens(route_finder, pairs):
+    """Load the token lists of every chain the queries can go through, before the first cell."""
+    from routing.route_planner import HUB_ASSETS
+    chains = {chain for pair in pairs for chain in pair[:2]} | {"Base"} | {chain for chain, _ in HUB_ASSETS}
+    for chain in sorted(chains):
+        chain_id = route_finder.get_chain_id(chain)
+        if chain_id is None:
+            continue
+        try:
+            route_finder.token_registry.load_chain(chain_id)
+        except Exception:
+            pass  # the queries resolve its tokens one by one
+    route_finder.failure_cache.clear()
+
+
+def run_cell(route_finder, server, pair, variant, concurrency, queries, use_cache=False):
+    """Run `queries` identical queries with `concurrency` in flight, return the cell metrics."""
+    src_chain, dst_chain, token, amount = pair
+    reset_state(route_finder)
+    server.reset_counts()
+
+    latencies = []
+    strategy_latencies = defaultdict(list)
+    failures = 0
+
+    def one_query(_):
+        nonlocal failures
+        start = time.perf_counter()
+
+        def on_result(event):
+            if event["status"] == "ok":
+                strategy_latencies[event["type"]].append(time.perf_counter() - start)
+
+        try:
+            result = route_finder.find_best_routes_parallel(
+                src_chain, dst_chain, token, token, amount, "CHEAPEST",
+                fresh=not use_cache, on_result=on_result, **VARIANTS[variant]
+            )
+            if not result.get("best"):
+                failures += 1
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_query, range(queries)))
+    wall = time.perf_counter() - started
+
+    upstream = sum(server.calls.values())
+    return {
+        "pair": f"{src_chain}->{dst_chain} {token}",
+        "variant": variant,
+        "concurrency": concurrency,
+        "queries": queries,
+        "failures": failures,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "throughput_qps": round(queries / wall, 2),
+        "upstream_calls": upstream,
+        "calls_per_query": round(upstream / queries, 2),
+        "strategy_p50_ms": {name: _ms(percentile(values, 50)) for name, values in sorted(strategy_latencies.items())},
+    }
+
+
+def print_table(rows):
+    columns = ["pair", "variant", "concurrency", "p50_ms", "p95_ms", "p99_ms", "throughput_qps", "calls_per_query", "failures"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+        print("    strategies p50: " + ", ".join(f"{k}={v}ms" for k, v in row["strategy_p50_ms"].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the route finder against a local mock li.quest.")
+    parser.add_argument("--fixture", help="recorded fixture JSON (synthetic fixture if omitted)")
+    parser.add_argument("--pair", action="append", type=parse_pair, help="src_chain:dst_chain:token:amount, repeatable")
+    parser.add_argument("--variant", action="append", choices=sorted(VARIANTS), help="engine variants, repeatable")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--queries", type=int, default=20, help="queries per cell")
+    parser.add_argument("--latency", default="lognormal:150,0.4", help="mock latency model, see LatencyModel")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--use-cache", action="store_true", help="let repeated queries hit the quote cache")
+    parser.add_argument("--rate-limit", type=float, help="starting rate of the li.quest rate limiter (production default if omitted)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    fixture = Fixture.load(args.fixture) if args.fixture else synthetic_fixture()
+    server = MockLifiServer(
+        fixture, latency=LatencyModel(args.latency),
+        errors=ErrorModel(args.error_rate, throttle_rate=args.throttle_rate)
+    ).start()
+
+    from routing import route_finder
+    from routing.config import configure
+    configure(base_url=server.url)
+    if args.rate_limit:
+        route_finder.rate_limiter = route_finder.AdaptiveRateLimiter(rate=args.rate_limit, burst=max(1, int(args.rate_limit)))
+
+    pairs = args.pair or [parse_pair(p) for p in DEFAULT_PAIRS]
+    variants = args.variant or list(VARIANTS)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    warm_tokens(route_finder, pairs)
+
+    rows = []
+    for pair in pairs:
+        for variant in variants:
+            for concurrency in levels:
+                rows.append(run_cell(route_finder, server, pair, variant, concurrency, args.queries, args.use_cache))
+
+    server.shutdown()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Headless li.quest routing core. Nothing in this package imports Streamlit.
+
+The main entry points are re-exported here and imported on first access, so
+`import routing` stays cheap:
+
+    import routing
+    routing.configure(api_key="...")
+    routing.find_best_routes_parallel("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+"""
+
+import importlib
+
+
+_EXPORTS = {
+    "configure": "routing.config",
+    "settings": "routing.config",
+    "find_best_routes_parallel": "routing.route_finder",
+    "iter_best_routes": "routing.route_finder",
+    "find_best_routes_sync": "routing.async_engine",
+    "find_best_routes_graph": "routing.route_planner",
+    "sweep_routes": "routing.sweep",
+    "estimate_routes": "routing.sweep",
+    "run_batch": "routing.batch",
+    "tracer": "routing.tracing",
+    "metrics": "routing.tracing",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'routing' has no attribute '{name}'")
+    return getattr(importlib.import_module(module), name)
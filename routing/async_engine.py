@@ -0,0 +1,118 @@
+"""
+Asyncio route engine, next to the thread-driven one of route_finder.
+
+The quoting logic exists once, as step generators in route_finder (query_steps,
+hop_dag_steps...): they submit hops to the shared route executor and yield a Wait
+step whenever they have to wait for one. iter_best_routes drives them by blocking
+its thread; this module awaits the same steps on an event loop instead, so one loop
+can hold any number of in-flight queries without a thread per query or strategy.
+Results, deadlines, hop sharing and failure handling are therefore the same.
+
+    result = await find_best_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+
+Code without an event loop (Streamlit, scripts) calls find_best_routes_sync, which
+runs the coroutine on a background loop shared by the whole process.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import asyncio
+import threading
+
+from routing import route_finder
+from routing.route_finder import Wait, query_steps, request_priority, submit_in_context
+from routing.scheduler import route_executor
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+########################################
+### EVENT LOOP
+########################################
+
+def get_loop():
+    """The background event loop of find_best_routes_sync, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="route-engine-loop", daemon=True).start()
+        return _loop
+
+
+async def wait(step):
+    """Await a Wait step: until one of its futures is done or its deadline passes."""
+    if not step.futures:
+        await asyncio.sleep(step.timeout() or 0)
+        return
+    await asyncio.wait([asyncio.wrap_future(future) for future in step.futures],
+                       timeout=step.timeout(), return_when=asyncio.FIRST_COMPLETED)
+
+
+async def run(fn, *args, **kwargs):
+    """Await a blocking call run on the shared route executor, in the caller's context."""
+    executor = route_executor.session(request_priority.get(), limit=1)
+    try:
+        return await asyncio.wrap_future(submit_in_context(executor, fn, *args, **kwargs))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+########################################
+### FUNCTIONS
+########################################
+
+async def resolve_token(chain_id, token_input):
+    """Async route_finder.resolve_token."""
+    return await run(route_finder.resolve_token, chain_id, token_input)
+
+
+async def jumper_quote(originChain, destinationChain, originToken, destinationToken, amount, price_from_amount,
+                       price_to_amount, order, fresh=False):
+    """Async route_finder.jumper_quote."""
+    return await run(route_finder.jumper_quote, originChain, destinationChain, originToken, destinationToken,
+                     amount, price_from_amount, price_to_amount, order, fresh)
+
+
+async def iter_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh=False,
+                           speculative=False, deadline_ms=None, prune=False, multi_route=False, planner=False):
+    """Async route_finder.iter_best_routes (same parameters and events)."""
+    steps = query_steps(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh,
+                        speculative, deadline_ms, prune, multi_route, planner)
+    try:
+        for step in steps:
+            if isinstance(step, Wait):
+                await wait(step)
+            else:
+                yield step
+    finally:
+        steps.close()
+
+
+async def find_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh=False,
+                           speculative=False, deadline_ms=None, prune=False, on_result=None, multi_route=False,
+                           planner=False):
+    """Async route_finder.find_best_routes_parallel (same parameters and result)."""
+    events = iter_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh,
+                              speculative, deadline_ms, prune, multi_route, planner)
+    try:
+        async for event in events:
+            if event["done"]:
+                return event["result"]
+            if on_result is not None:
+                on_result(event)
+    finally:
+        await events.aclose()
+
+
+def find_best_routes_sync(*args, timeout=None, **kwargs):
+    """
+    find_best_routes (same arguments) run on the background loop, for callers without
+    one. The caller's context (request priority...) is kept; `on_result` is called from
+    the loop thread.
+    """
+    return asyncio.run_coroutine_threadsafe(find_best_routes(*args, **kwargs), get_loop()).result(timeout)
@@ -0,0 +1,225 @@
+"""
+Headless batch routing.
+
+    python -m routing.batch queries.csv -o results.jsonl --concurrency 8
+
+Queries are read from a CSV file (with a header) or a JSONL file, one query per
+row with the fields src_chain, dst_chain, src_token, dst_token, amount and an
+optional order (CHEAPEST by default). A single `token` field can replace
+src_token/dst_token when both are the same.
+
+Results are streamed to the output JSONL as {"row", "query", "result"} lines
+(or {"row", "query", "error"}). The output doubles as the checkpoint: rerunning
+the same command skips the rows already written and appends the rest.
+
+--trace FILE appends the trace of every query to FILE as JSON lines, --metrics FILE
+writes the metrics at the end (Prometheus text for a .prom file, JSON otherwise).
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from routing.route_finder import (
+    PRIORITY_BATCH,
+    find_best_routes_parallel,
+    get_chain_id,
+    request_priority,
+    token_registry,
+)
+from routing import tracing
+
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_ORDER = "CHEAPEST"
+
+
+########################################
+### INPUT / OUTPUT
+########################################
+
+def read_queries(path):
+    """Read queries from a CSV or JSONL file, returns a list of dicts."""
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    return [parse_query(row) for row in rows]
+
+
+def parse_query(row):
+    """Normalize one input row into a query dict. Raises KeyError/ValueError on a bad row."""
+    token = row.get("token")
+    query = {
+        "src_chain": row["src_chain"],
+        "dst_chain": row["dst_chain"],
+        "src_token": row.get("src_token") or token,
+        "dst_token": row.get("dst_token") or token,
+        "amount": float(row["amount"]),
+        "order": row.get("order") or DEFAULT_ORDER,
+    }
+    if not query["src_token"] or not query["dst_token"]:
+        raise KeyError("src_token/dst_token (or token)")
+    return query
+
+
+def read_checkpoint(path):
+    """
+    Return the row numbers already written to the output file.
+    A torn last line (interrupted write) is cut off so appending stays valid JSONL.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    done = set()
+    for line in data.splitlines():
+        try:
+            done.add(json.loads(line)["row"])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+
+########################################
+### FUNCTIONS
+########################################
+
+def _query_key(query):
+    return tuple(query[field] for field in ("src_chain", "dst_chain", "src_token", "dst_token", "amount", "order"))
+
+
+def warm_query_tokens(queries):
+    """Resolve every distinct token of `queries` (query dicts) once, concurrently, before routing them."""
+    tokens = set()
+    for query in queries:
+        for chain, token in ((query["src_chain"], query["src_token"]), (query["dst_chain"], query["dst_token"])):
+            chain_id = get_chain_id(chain)
+            if chain_id is not None:
+                tokens.add((chain_id, token))
+    token_registry.resolve_many(list(tokens), return_exceptions=True)
+
+
+def route_query(query, deadline_ms=None):
+    # Batch calls queue behind interactive ones in the shared rate limiter
+    token = request_priority.set(PRIORITY_BATCH)
+    try:
+        return find_best_routes_parallel(
+            src_chain_name=query["src_chain"],
+            dst_chain_name=query["dst_chain"],
+            src_token=query["src_token"],
+            dst_token=query["dst_token"],
+            amount=query["amount"],
+            order=query["order"],
+            deadline_ms=deadline_ms
+        )
+    finally:
+        request_priority.reset(token)
+
+
+def run_batch(queries, output_path, concurrency=DEFAULT_CONCURRENCY, deadline_ms=None, progress=None):
+    """
+    Route `queries` with at most `concurrency` queries in flight and append one
+    line per row to `output_path`. Rows already in the output are skipped.
+    Identical queries are routed once; token metadata, quotes and in-flight
+    requests are shared across rows through the route_finder caches.
+    Returns the number of rows written.
+    """
+    done = read_checkpoint(output_path)
+    todo = {}  # query key -> row numbers still to write
+    for row, query in enumerate(queries):
+        if row not in done:
+            todo.setdefault(_query_key(query), []).append(row)
+    if not todo:
+        return 0
+
+    token = request_priority.set(PRIORITY_BATCH)
+    try:
+        warm_query_tokens([queries[rows[0]] for rows in todo.values()])
+    finally:
+        request_priority.reset(token)
+
+    total = sum(len(rows) for rows in todo.values())
+    written = 0
+
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        def write(rows, payload):
+            nonlocal written
+            for row in rows:
+                out.write(json.dumps({"row": row, "query": queries[row], **payload}) + "\n")
+            out.flush()
+            written += len(rows)
+            if progress is not None:
+                progress(written, total)
+
+        # Submit lazily so thousands of rows don't sit in the executor queue
+        pending = {}
+        items = iter(todo.items())
+        while True:
+            while len(pending) < concurrency * 2:
+                item = next(items, None)
+                if item is None:
+                    break
+                _, rows = item
+                pending[executor.submit(route_query, queries[rows[0]], deadline_ms)] = rows
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rows = pending.pop(future)
+                try:
+                    write(rows, {"result": future.result()})
+                except Exception as e:
+                    write(rows, {"error": str(e)})
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Route a batch of queries from CSV or JSONL.")
+    parser.add_argument("input", help="CSV (with header) or JSONL file of queries")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output, also used to resume")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="queries routed at the same time")
+    parser.add_argument("--deadline-ms", type=int, default=None, help="latency budget of each query")
+    parser.add_argument("--trace", help="append the trace of every query to this JSONL file")
+    parser.add_argument("--metrics", help="write the metrics to this file (.prom: Prometheus text, else JSON)")
+    args = parser.parse_args(argv)
+
+    queries = read_queries(args.input)
+    if args.trace or args.metrics:
+        tracing.enable()
+    if args.trace:
+        tracing.tracer.exporters.append(tracing.JsonLinesExporter(args.trace))
+
+    def progress(written, total):
+        print(f"\r{written}/{total} rows", end="", file=sys.stderr, flush=True)
+
+    written = run_batch(queries, args.output, args.concurrency, args.deadline_ms, progress)
+    print(f"\n{written} rows written to {args.output}", file=sys.stderr)
+
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            if args.metrics.endswith(".prom"):
+                f.write(tracing.metrics.to_prometheus())
+            else:
+                json.dump(tracing.metrics.snapshot(), f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
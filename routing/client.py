@@ -0,0 +1,95 @@
+"""
+Client of the route service (see routing/service.py), standard library only.
+
+    client = RouteClient("http://127.0.0.1:8700")
+    client.find_best_routes_parallel("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+
+The methods mirror the local route_finder functions, so a front end can switch
+between the in-process engine and the shared service.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import json
+import urllib.error
+import urllib.request
+
+
+DEFAULT_TIMEOUT = 60
+
+
+class RouteServiceError(Exception):
+    pass
+
+
+########################################
+### CLIENT
+########################################
+
+class RouteClient:
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path, body):
+        request = urllib.request.Request(
+            self.base_url + path, data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error")
+            except ValueError:
+                message = None
+            raise RouteServiceError(message or f"Route service returned HTTP {e.code}") from None
+        except urllib.error.URLError as e:
+            raise RouteServiceError(f"Route service unreachable: {e.reason}") from None
+
+    @staticmethod
+    def _query(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, speculative, deadline_ms, prune,
+               multi_route, planner):
+        return {
+            "src_chain": src_chain_name, "dst_chain": dst_chain_name,
+            "src_token": src_token, "dst_token": dst_token,
+            "amount": amount, "order": order,
+            "speculative": speculative, "deadline_ms": deadline_ms, "prune": prune, "multi_route": multi_route,
+            "planner": planner,
+        }
+
+    def iter_best_routes(self, src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                         speculative=False, deadline_ms=None, prune=False, multi_route=False, planner=False):
+        """Same events as route_finder.iter_best_routes, streamed from the service."""
+        query = self._query(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                            speculative, deadline_ms, prune, multi_route, planner)
+        with self._post("/route?stream=1", query) as response:
+            for line in response:
+                event = json.loads(line)
+                if event.get("error"):
+                    raise RouteServiceError(event["error"])
+                yield event
+
+    def find_best_routes_parallel(self, src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                                  speculative=False, deadline_ms=None, prune=False, on_result=None, multi_route=False,
+                                  planner=False):
+        """Same result as route_finder.find_best_routes_parallel, computed by the service."""
+        if on_result is None:
+            query = self._query(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                                speculative, deadline_ms, prune, multi_route, planner)
+            with self._post("/route", query) as response:
+                return json.load(response)
+
+        for event in self.iter_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                                           speculative, deadline_ms, prune, multi_route, planner):
+            if event["done"]:
+                return event["result"]
+            on_result(event)
+
+    def batch(self, queries, deadline_ms=None):
+        """Route a list of query dicts (routing.batch format), returns [{"result"} | {"error"}] in order."""
+        with self._post("/batch", {"queries": queries, "deadline_ms": deadline_ms}) as response:
+            return json.load(response)["results"]
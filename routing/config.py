@@ -0,0 +1,85 @@
+"""
+Configuration of the routing core: li.quest API key, base URL and timeouts.
+
+Read from the environment at import time:
+
+    LIFI_API_KEY        API key sent as x-lifi-api-key (optional, li.quest allows anonymous calls)
+    LIFI_BASE_URL       API root, e.g. a local mock server (default https://li.quest)
+    LIFI_TIMEOUT        "connect,read" timeouts in seconds of every endpoint, in place of
+                        DEFAULT_ENDPOINT_TIMEOUTS (default: per endpoint, 3.05,15 for others)
+
+or set explicitly with configure(), which front ends call with their own secrets.
+Nothing here imports Streamlit or an HTTP client.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import os
+
+
+DEFAULT_BASE_URL = "https://li.quest"
+
+# (connect, read) timeouts in seconds, per endpoint
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    "/v1/token": (3.05, 10),
+    "/v1/tokens": (3.05, 30),
+    "/v1/quote": (3.05, 20),
+    "/v1/advanced/routes": (3.05, 20),
+}
+DEFAULT_TIMEOUT = (3.05, 15)
+
+
+########################################
+### SETTINGS
+########################################
+
+def _parse_timeout(text):
+    connect, _, read = text.partition(",")
+    return float(connect), float(read or connect)
+
+
+class Settings:
+
+    def __init__(self, api_key=None, base_url=DEFAULT_BASE_URL, endpoint_timeouts=None, default_timeout=DEFAULT_TIMEOUT):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.endpoint_timeouts = dict(DEFAULT_ENDPOINT_TIMEOUTS if endpoint_timeouts is None else endpoint_timeouts)
+        self.default_timeout = default_timeout
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        timeout = environ.get("LIFI_TIMEOUT")
+        return cls(
+            api_key=environ.get("LIFI_API_KEY") or None,
+            base_url=environ.get("LIFI_BASE_URL") or DEFAULT_BASE_URL,
+            endpoint_timeouts={} if timeout else None,
+            default_timeout=_parse_timeout(timeout) if timeout else DEFAULT_TIMEOUT,
+        )
+
+    def headers(self):
+        headers = {"accept": "application/json"}
+        if self.api_key:
+            headers["x-lifi-api-key"] = self.api_key
+        return headers
+
+    def timeout(self, path):
+        return self.endpoint_timeouts.get(path, self.default_timeout)
+
+
+settings = Settings.from_env()
+
+
+def configure(api_key=None, base_url=None, endpoint_timeouts=None, default_timeout=None):
+    """Override the settings read from the environment. Arguments left to None are unchanged."""
+    if api_key is not None:
+        settings.api_key = api_key
+    if base_url is not None:
+        settings.base_url = base_url.rstrip("/")
+    if endpoint_timeouts is not None:
+        settings.endpoint_timeouts.update(endpoint_timeouts)
+    if default_timeout is not None:
+        settings.default_timeout = default_timeout
+    return settings
@@ -0,0 +1,252 @@
+"""
+On-demand profiling of one route query.
+
+    with QueryProfiler("sampling") as profiler:
+        result = find_best_routes_parallel(...)
+    print(profiler.report())
+    with open(profiler.filename, "wb") as f:
+        f.write(profiler.dump())
+    rows = timeline(result["trace"])
+
+Two profilers:
+
+    cprofile    deterministic profile of the calling thread: the query loop, the
+                on_result callbacks and whatever the caller renders in the block.
+                Hops run on the route executor threads and show up as waits.
+                dump() is a pstats file (python -m pstats, snakeviz...).
+    sampling    samples the stacks of every thread every `interval` seconds, so hops,
+                token loads and rate limiter waits are included. dump() is folded
+                stacks text (flamegraph.pl, speedscope).
+
+Queries run in the block are traced even while tracing is off, and timeline()
+turns their trace into a wall-clock timeline of strategies, hops and requests.
+Nothing here runs, and the route finder pays nothing, unless a QueryProfiler is used.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import cProfile
+import io
+import marshal
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from routing.tracing import tracer
+
+
+PROFILE_MODES = ("cprofile", "sampling")
+SAMPLE_INTERVAL = 0.005   # seconds between two stack samples
+REPORT_LIMIT = 30         # functions listed by report()
+
+
+########################################
+### PROFILERS
+########################################
+
+class _Sampler(threading.Thread):
+    """
+    Counts the stacks of every other thread, sampled every `interval` seconds.
+    Stacks of the `caller` thread (the one profiling) are labelled "caller".
+    """
+
+    def __init__(self, interval, caller):
+        super().__init__(name="query-profiler", daemon=True)
+        self.interval = interval
+        self.caller = caller
+        self.stacks = Counter()  # (thread name, outermost frame, ..., innermost frame) -> samples
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._done.wait(self.interval):
+            names = {thread.ident: re.sub(r"-\d+$", "", thread.name) for thread in threading.enumerate()}
+            names[self.caller] = "caller"
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.stacks[(names.get(ident, "thread"),) + tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class QueryProfiler:
+    """Context manager profiling the code run in its block, see the module docstring."""
+
+    def __init__(self, mode="cprofile", interval=SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.interval = interval
+        self.duration = None
+        self._profile = None
+        self._sampler = None
+        self._forced = None
+        self._started = None
+
+    @property
+    def filename(self):
+        return "route-query.prof" if self.mode == "cprofile" else "route-query.folded.txt"
+
+    def __enter__(self):
+        self._forced = tracer.forced()
+        self._forced.__enter__()
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler(self.interval, threading.get_ident())
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.duration = time.perf_counter() - self._started
+        self._forced.__exit__(exc_type, exc, tb)
+        return False
+
+    def report(self, limit=REPORT_LIMIT):
+        """
+        Text summary: functions by cumulative time (cprofile) or by samples (sampling).
+        The sampling summary only counts the caller thread and threads running the
+        route finder, dump() has every thread.
+        """
+        if self._profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+
+        sampler = self._sampler
+        inclusive = Counter()
+        own = Counter()
+        for stack, count in sampler.stacks.items():
+            if stack[0] != "caller" and not any(frame.startswith("routing.") for frame in stack[1:]):
+                continue
+            for frame in set(stack[1:]):
+                inclusive[frame] += count
+            own[stack[-1]] += count
+        lines = [f"{sampler.samples} samples every {self.interval * 1000:g} ms over {self.duration:.3f} s", ""]
+        lines.append(f"{'samples':>8} {'own':>8}  function")
+        for frame, count in inclusive.most_common(limit):
+            lines.append(f"{count:>8} {own[frame]:>8}  {frame}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        """The profile as bytes: a pstats file (cprofile) or folded stacks (sampling)."""
+        if self._profile is not None:
+            return marshal.dumps(pstats.Stats(self._profile).stats)
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in sorted(self._sampler.stacks.items())
+        ).encode()
+
+
+########################################
+### TIMELINE
+########################################
+
+def _short(token):
+    token = str(token)
+    return token if len(token) <= 12 else token[:6] + "…" + token[-4:]
+
+
+def _lane(span):
+    attrs = span["attrs"]
+    if span["name"] == "strategy":
+        return f"strategy {attrs.get('strategy')}"
+    if span["name"] == "hop":
+        return (f"hop {attrs.get('src_chain')}→{attrs.get('dst_chain')} "
+                f"{_short(attrs.get('src_token'))}→{_short(attrs.get('dst_token'))}")
+    if span["name"] == "load_tokens":
+        return f"tokens of chain {attrs.get('chain_id')}"
+    return span["name"]
+
+
+def timeline(trace):
+    """
+    Rows of a wall-clock timeline of a query trace (Span.to_dict), in start order:
+    {"lane", "kind", "start_ms", "end_ms", "status", "detail"} for every strategy,
+    hop, token load and request. Time a hop waited for an executor thread and a
+    request waited for the rate limiter are rows of kind "waiting" on the same lane.
+    Spans still running when the query returned end with it, status "running".
+    """
+    if not trace:
+        return []
+    query_end = trace["duration_ms"] or 0
+    rows = []
+
+    def walk(span, lane):
+        for child in span["children"]:
+            child_lane = _lane(child)
+            if child["name"] == "http":
+                child_lane = f"{lane} · {child['attrs'].get('path')}"
+            start = child["start_ms"]
+            running = child["duration_ms"] is None
+            end = query_end if running else start + child["duration_ms"]
+            attrs = child["attrs"]
+
+            wait_ms = attrs.get("executor_wait_ms") if child["name"] == "hop" else None
+            if wait_ms:
+                rows.append({"lane": child_lane, "kind": "waiting", "start_ms": round(start - wait_ms, 3),
+                             "end_ms": start, "status": "ok", "detail": "waiting for an executor thread"})
+            queued_ms = attrs.get("queued_ms") if child["name"] == "http" else None
+            if queued_ms:
+                rows.append({"lane": child_lane, "kind": "waiting", "start_ms": start,
+                             "end_ms": round(start + queued_ms, 3), "status": "ok", "detail": "rate limiter"})
+                start = round(start + queued_ms, 3)
+
+            rows.append({
+                "lane": child_lane,
+                "kind": child["name"],
+                "start_ms": start,
+                "end_ms": round(end, 3),
+                "status": "running" if running else child["status"],
+                "detail": child["error"] or ", ".join(
+                    f"{k}={v}" for k, v in attrs.items() if k in ("status", "tool", "efficiency", "cache", "attempt", "hops")
+                ),
+            })
+            walk(child, child_lane)
+
+    walk(trace, "query")
+    return sorted(rows, key=lambda row: row["start_ms"])
+
+
+def timeline_spec(rows):
+    """Vega-Lite spec of a Gantt chart of timeline() rows (st.vega_lite_chart and the like)."""
+    lanes = len({row["lane"] for row in rows})
+    return {
+        "data": {"values": rows},
+        "mark": {"type": "bar", "cornerRadius": 2},
+        "height": max(120, 18 * lanes),
+        "encoding": {
+            "y": {"field": "lane", "type": "nominal", "sort": None, "title": None, "axis": {"labelLimit": 320}},
+            "x": {"field": "start_ms", "type": "quantitative", "title": "ms since the query started"},
+            "x2": {"field": "end_ms"},
+            "color": {"field": "kind", "type": "nominal", "title": None},
+            "opacity": {"condition": {"test": "datum.status === 'ok'", "value": 1}, "value": 0.5},
+            "tooltip": [
+                {"field": "lane", "type": "nominal"},
+                {"field": "kind", "type": "nominal"},
+                {"field": "start_ms", "type": "quantitative"},
+                {"field": "end_ms", "type": "quantitative"},
+                {"field": "status", "type": "nominal"},
+                {"field": "detail", "type": "nominal"},
+            ],
+        },
+    }
@@ -1,23 +1,482 @@
+"""
+Headless routing core: finds the best li.quest route between two (chain, token)
+pairs. Configuration (API key, base URL, timeouts) comes from routing.config, so
+this module works without Streamlit; the HTTP client is imported on first use.
+"""
 
 ########################################
 ### LIBRARY
 ########################################
 
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import streamlit as st
+import contextvars
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+
+from routing.config import settings
+from routing.scheduler import queued_seconds, route_executor
+from routing.tracing import metrics, tracer
 
 
 ########################################
-### UTILS
+### RATE LIMITING
 ########################################
 
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_WARM = 20           # background cache warming, behind everything else
+
+# Priority of the li.quest calls made in the current context (lower goes first).
+# Work submitted to executors must go through submit_in_context to keep it.
+request_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+RATE_LIMIT = 10.0            # starting request rate per second
+RATE_LIMIT_MIN = 0.5
+RATE_LIMIT_MAX = 50.0
+RATE_LIMIT_BURST = 10
+RATE_INCREASE = 0.1          # additive increase per successful call
+CONCURRENCY_LIMIT = 8        # starting number of requests in flight
+CONCURRENCY_LIMIT_MIN = 1
+RETRY_AFTER_MAX = 60         # never pause longer than this on a Retry-After header
+
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide token bucket plus a concurrency limit for li.quest calls, adjusted
+    AIMD-style: every successful call raises the rate and the concurrency limit a
+    little, every 429 halves both and pauses all calls for its Retry-After.
+    Waiting calls are served by priority, then in arrival order. The rate never
+    climbs above `max_rate`.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_LIMIT_BURST, concurrency=CONCURRENCY_LIMIT, max_rate=RATE_LIMIT_MAX):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.concurrency = float(concurrency)
+        self.max_concurrency = concurrency * 4
+        self.in_flight = 0
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _try_take(self, ticket):
+        """Grant `ticket` if it is next in line and allowed, else return how long to wait (None: until a release)."""
+        now = time.monotonic()
+        self._refill(now)
+        if self._waiting[0] != ticket:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return None
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        heapq.heappop(self._waiting)
+        self._tokens -= 1
+        self.in_flight += 1
+        self._cond.notify_all()  # the next ticket may be allowed too
+        return 0
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE):
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                wait = self._try_take(ticket)
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    def release(self, status=None, retry_after=None):
+        """Return a slot, adapting the limits to the response status (None: no response)."""
+        with self._cond:
+            self.in_flight -= 1
+            if status == 429:
+                self.throttled += 1
+                self.rate = max(RATE_LIMIT_MIN, self.rate / 2)
+                self.concurrency = max(CONCURRENCY_LIMIT_MIN, self.concurrency / 2)
+                self._tokens = min(self._tokens, 0)
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + min(retry_after, RETRY_AFTER_MAX))
+            elif status is not None and status < 500:
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "in_flight": self.in_flight,
+                "rate": round(self.rate, 2),
+                "concurrency_limit": int(self.concurrency),
+                "throttled": self.throttled,
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            }
+
+
+rate_limiter = AdaptiveRateLimiter()
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit that keeps the caller's context (request priority...)."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header given in seconds, None if absent or not a number."""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+########################################
+### HTTP TRANSPORT
+########################################
+
+# Hops of one query quoted at once on the shared route_executor (see routing/scheduler.py)
+MAX_WORKERS = 4
+
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.25      # base delay in seconds, doubled on each attempt
+RETRY_BACKOFF_MAX = 2.0
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Called as hook(path, params, response) after every li.quest response (fixture recording...),
+# params is the JSON body of POST requests
+response_hooks = []
+
+# Called as hook(src_chain, dst_chain, src_token, dst_token, amount, order) for every
+# interactive query (popularity tracking of the cache warmer...)
+query_hooks = []
+
+# One connection pool for the whole process, one Session per thread on top of it
+_adapter = None
+_adapter_lock = threading.Lock()
+_local = threading.local()
+
+
+def pool_size():
+    """
+    Keep-alive connections per host: as many as requests can be in flight, i.e. one
+    per route executor thread, or the rate limiter's ceiling if that is higher.
+    """
+    return max(route_executor.max_workers, int(rate_limiter.max_concurrency))
+
+
+def get_adapter():
+    global _adapter
+    with _adapter_lock:
+        if _adapter is None:
+            from requests.adapters import HTTPAdapter
+            _adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size(), max_retries=0)
+        return _adapter
+
+
+def get_session():
+    """Return this thread's Session, backed by the shared keep-alive pool."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests
+        session = requests.Session()
+        session.mount("https://", get_adapter())
+        session.mount("http://", get_adapter())
+        _local.session = session
+    return session
+
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+
+def lifi_get(path, params=None):
+    return lifi_request("GET", path, params=params)
+
+
+def lifi_post(path, body):
+    return lifi_request("POST", path, body=body)
+
+
+def lifi_request(method, path, params=None, body=None):
+    """
+    Call a li.quest endpoint through the pooled session and the rate limiter.
+    5xx responses and connection errors are retried with jittered backoff, 429s
+    after the pause the rate limiter derives from Retry-After. The last response
+    (or exception) is returned to the caller.
+    """
+    import requests
+
+    url, timeout, headers = settings.base_url + path, settings.timeout(path), settings.headers()
+    for attempt in range(RETRY_ATTEMPTS):
+        last_attempt = attempt == RETRY_ATTEMPTS - 1
+        with tracer.span("http", path=path, attempt=attempt + 1) as span:
+            rate_limiter.acquire(request_priority.get())
+            sent = time.perf_counter()
+            status = retry_after = None
+            try:
+                response = get_session().request(method, url, params=params, json=body, headers=headers, timeout=timeout)
+                status, retry_after = response.status_code, retry_after_seconds(response)
+                for hook in response_hooks:
+                    hook(path, params if body is None else body, response)
+            except requests.ConnectionError as e:
+                span.fail(e)
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code == 429 and not last_attempt:
+                    continue  # the rate limiter holds the next attempt back
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+            finally:
+                rate_limiter.release(status, retry_after)
+                if span.recording:
+                    record_http(span, path, status, sent, response if status is not None else None)
+        time.sleep(_backoff(attempt))
+
+
+def _error_message(response):
+    try:
+        return response.json().get("message")
+    except (ValueError, AttributeError):
+        return None
+
+
+def record_http(span, path, status, sent, response=None):
+    """Tracing of one li.quest request: span attributes and the HTTP metrics."""
+    elapsed = time.perf_counter() - sent
+    # Time spent waiting for the rate limiter before the request was sent
+    span.set(status=status, queued_ms=round((time.time() - span.start - elapsed) * 1000, 3))
+    if status is not None and status >= 400:
+        message = _error_message(response) if response is not None else None
+        span.fail(f"HTTP {status}: {message}" if message else f"HTTP {status}")
+    metrics.inc("lifi_http_requests_total", path=path, status=status or "error")
+    metrics.observe("lifi_http_request_seconds", elapsed, path=path)
+
+########################################
+### REQUEST COALESCING
+########################################
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical requests: the first caller for a key runs it,
+    callers arriving while it is in flight wait and get its result or its exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0  # callers served by someone else's request
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+inflight = SingleFlight()
+
+########################################
+### FAILURES
+########################################
+
+FAILURE_CACHE_SIZE = 4096
+FAILURE_TTL = 60             # seconds a definitive failure (4xx) is served from the cache
+FAILURE_BUCKET_RATIO = 10    # a failed quote also covers amounts within 10x of it
+
+BREAKER_THRESHOLD = 5        # consecutive failed quotes (errors, 5xx) on a chain pair before it trips
+BREAKER_COOLDOWN = 30        # seconds open before a half-open probe
+BREAKER_COOLDOWN_MAX = 600   # the cooldown doubles on every failed probe, up to this
+
+
+class HopUnavailable(ValueError):
+    """
+    li.quest has no answer for a hop or a token. `definitive` failures (4xx other
+    than 429) would fail the same way if retried, so they are negative-cached.
+    """
+
+    def __init__(self, message, definitive=False):
+        super().__init__(message)
+        self.definitive = definitive
+
+
+def http_failure(response, what):
+    """HopUnavailable describing a non-200 li.quest response."""
+    status = response.status_code
+    message = _error_message(response)
+    reason = f"{what}: HTTP {status}" + (f" ({message})" if message else "")
+    return HopUnavailable(reason, definitive=400 <= status < 500 and status != 429)
+
+
+class FailureCache:
+    """Bounded LRU of failure reasons with a short TTL."""
+
+    def __init__(self, maxsize=FAILURE_CACHE_SIZE, ttl=FAILURE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, reason)
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, key):
+        """Reason of a recent failure of `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, reason):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, reason)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits}
+
+
+def failure_key(fromChain, toChain, fromToken, toToken, order, amount):
+    bucket = math.floor(math.log(amount, FAILURE_BUCKET_RATIO)) if amount > 0 else None
+    return ("quote", fromChain, toChain, fromToken, toToken, order, bucket)
+
+
+class CircuitBreaker:
+    """
+    Per chain pair (fromChain, toChain) circuit breaker for quotes.
+
+    Only failures of li.quest itself count (connection errors, timeouts, 5xx): a 4xx
+    is about one request (unknown token, dust amount...) and goes to the failure
+    cache instead, so one user's bad queries cannot switch off a pair for everyone.
+
+    Closed: quotes go through. After `threshold` consecutive failures the pair is
+    open: quotes fail immediately and strategies using it are skipped. After the
+    cooldown one probe quote is let through (half-open): success closes the pair,
+    failure opens it again for twice as long.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, cooldown_max=BREAKER_COOLDOWN_MAX):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.cooldown_max = cooldown_max
+        self._pairs = {}  # pair -> {"failures", "opened_at", "cooldown", "probing"}
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    def is_open(self, pair):
+        """True while `pair` is open and not yet due for a probe."""
+        with self._lock:
+            state = self._pairs.get(pair)
+            return (
+                state is not None and state["opened_at"] is not None
+                and (state["probing"] or time.monotonic() < state["opened_at"] + state["cooldown"])
+            )
+
+    def allow(self, pair):
+        """Whether a quote on `pair` may be sent now. Claims the probe of a half-open pair."""
+        with self._lock:
+            state = self._pairs.get(pair)
+            if state is None or state["opened_at"] is None:
+                return True
+            if state["probing"] or time.monotonic() < state["opened_at"] + state["cooldown"]:
+                return False
+            state["probing"] = True
+            return True
+
+    def success(self, pair):
+        with self._lock:
+            self._pairs.pop(pair, None)
+
+    def answered(self, pair):
+        """li.quest answered for `pair` without a quote (4xx): a probe succeeds, failures are kept."""
+        with self._lock:
+            state = self._pairs.get(pair)
+            if state is not None and state["probing"]:
+                del self._pairs[pair]
+
+    def failure(self, pair):
+        with self._lock:
+            state = self._pairs.setdefault(
+                pair, {"failures": 0, "opened_at": None, "cooldown": self.cooldown, "probing": False}
+            )
+            state["failures"] += 1
+            if state["probing"]:
+                state["probing"] = False
+                state["opened_at"] = time.monotonic()
+                state["cooldown"] = min(self.cooldown_max, state["cooldown"] * 2)
+            elif state["opened_at"] is None and state["failures"] >= self.threshold:
+                state["opened_at"] = time.monotonic()
+                self.trips += 1
+
+    def reset(self):
+        with self._lock:
+            self._pairs.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": sum(1 for state in self._pairs.values() if state["opened_at"] is not None),
+                "trips": self.trips,
+            }
+
+
+failure_cache = FailureCache()
+circuit_breaker = CircuitBreaker()
 
-lifi_key= st.secrets["auth_token"]
-headers = {
-    "accept": "application/json",
-    "x-lifi-api-key": lifi_key
-    }
 
 def is_address_format(token: str):
     """Heuristic check to distinguish symbols from addresses based on chain-specific formats."""
@@ -35,12 +494,19 @@ def resolve_token(chain_id, token_input):
     #if is_address_format(token_input):
     #    return token_input, None
     # Otherwise, it's a symbol — resolve via API
-    token_resp = requests.get(
-        f"https://li.quest/v1/token?chain={chain_id}&token={token_input}",
-        headers=headers
-    )
+    reason = failure_cache.get(("token", chain_id, token_input))
+    if reason is not None:
+        raise HopUnavailable(f"{reason} (cached)", definitive=True)
+    return inflight.do(("token", chain_id, token_input), _fetch_token, chain_id, token_input)
+
+
+def _fetch_token(chain_id, token_input):
+    token_resp = lifi_get("/v1/token", {"chain": chain_id, "token": token_input})
     if token_resp.status_code != 200:
-        raise ValueError(f"Failed to resolve token '{token_input}' on chain {chain_id}")
+        error = http_failure(token_resp, f"Failed to resolve token '{token_input}' on chain {chain_id}")
+        if error.definitive:
+            failure_cache.put(("token", chain_id, token_input), str(error))
+        raise error
     token_data = token_resp.json()
     return token_data["address"], token_data["decimals"], token_data["priceUSD"]
 
@@ -128,6 +594,324 @@ def get_chain_id(chain_name):
     }
     return chain_id_mapping.get(chain_name)
 
+########################################
+### TOKEN REGISTRY
+########################################
+
+# Seconds between two background refreshes of the token prices
+TOKEN_REFRESH_INTERVAL = 300
+# Seconds a chain whose bulk load failed is not loaded again, tokens are resolved one by one meanwhile
+TOKEN_LOAD_RETRY = 30
+
+
+def _address_key(address):
+    """EVM addresses are case-insensitive, other chains (Solana, Sui...) are not."""
+    return address.lower() if address.startswith("0x") else address
+
+
+class TokenRegistry:
+    """
+    In-memory token metadata (address, decimals, priceUSD) per chain.
+
+    Tokens are bulk-loaded once per chain from `/v1/tokens` and indexed by
+    chain+symbol and chain+address, so lookups do not hit the network.
+    Prices of the loaded chains are refreshed by a background thread.
+    """
+
+    def __init__(self, refresh_interval=TOKEN_REFRESH_INTERVAL, load_retry=TOKEN_LOAD_RETRY):
+        self.refresh_interval = refresh_interval
+        self.load_retry = load_retry
+        self._lock = threading.Lock()
+        self._chain_locks = {}
+        self._loaded_chains = set()
+        self._failed_loads = {}   # chain_id -> (retry_at, reason) of its last failed bulk load
+        self._by_symbol = {}      # (chain_id, SYMBOL) -> token
+        self._by_address = {}     # (chain_id, address) -> token
+        self._ambiguous = set()   # (chain_id, SYMBOL) listed more than once
+        self._resolved = {}       # (chain_id, token_input) -> token, from /v1/token fallbacks
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def _fetch_chain(self, chain_id):
+        reason = failure_cache.get(("tokens", chain_id))
+        if reason is not None:
+            raise HopUnavailable(f"{reason} (cached)", definitive=True)
+        resp = lifi_get("/v1/tokens", {"chains": chain_id})
+        if resp.status_code != 200:
+            error = http_failure(resp, f"Failed to load tokens for chain {chain_id}")
+            if error.definitive:
+                failure_cache.put(("tokens", chain_id), str(error))
+            raise error
+        return resp.json().get("tokens", {}).get(str(chain_id), [])
+
+    def index_chain(self, chain_id, tokens):
+        """(Re)build the indexes of a chain from a `/v1/tokens` list."""
+        by_symbol = {}
+        ambiguous = set()
+        by_address = {}
+        for token in tokens:
+            entry = {
+                "address": token["address"],
+                "decimals": token["decimals"],
+                "priceUSD": token.get("priceUSD"),
+            }
+            by_address[(chain_id, _address_key(token["address"]))] = entry
+            symbol_key = (chain_id, token["symbol"].upper())
+            if symbol_key in by_symbol:
+                ambiguous.add(symbol_key)
+            else:
+                by_symbol[symbol_key] = entry
+
+        with self._lock:
+            for key in [k for k in self._by_symbol if k[0] == chain_id]:
+                del self._by_symbol[key]
+            for key in [k for k in self._by_address if k[0] == chain_id]:
+                del self._by_address[key]
+            self._ambiguous = {k for k in self._ambiguous if k[0] != chain_id} | ambiguous
+            self._by_symbol.update({k: v for k, v in by_symbol.items() if k not in ambiguous})
+            self._by_address.update(by_address)
+            # Keep prices of tokens resolved one by one in sync with the bulk data
+            for (resolved_chain, _), entry in self._resolved.items():
+                fresh = by_address.get((resolved_chain, _address_key(entry["address"])))
+                if resolved_chain == chain_id and fresh:
+                    entry["priceUSD"] = fresh["priceUSD"]
+            self._loaded_chains.add(chain_id)
+            self._failed_loads.pop(chain_id, None)
+
+    def _check_failed_load(self, chain_id):
+        """Raise if the last bulk load of `chain_id` failed less than `load_retry` seconds ago. Holds the lock."""
+        failed = self._failed_loads.get(chain_id)
+        if failed is not None and time.monotonic() < failed[0]:
+            raise ValueError(f"{failed[1]} (not retried for {failed[0] - time.monotonic():.0f} s)")
+
+    def load_chain(self, chain_id):
+        """
+        Bulk-load the token list of a chain (no-op if it is already loaded). After a
+        failed load, calls raise right away for `load_retry` seconds instead of retrying.
+        """
+        with self._lock:
+            if chain_id in self._loaded_chains:
+                return
+            self._check_failed_load(chain_id)
+            chain_lock = self._chain_locks.setdefault(chain_id, threading.Lock())
+
+        # One loader per chain, concurrent callers wait for it
+        with chain_lock:
+            with self._lock:
+                if chain_id in self._loaded_chains:
+                    return
+                self._check_failed_load(chain_id)
+            try:
+                with tracer.span("load_tokens", chain_id=chain_id):
+                    self.index_chain(chain_id, self._fetch_chain(chain_id))
+            except Exception as e:
+                with self._lock:
+                    self._failed_loads[chain_id] = (time.monotonic() + self.load_retry, str(e))
+                raise
+        self.start_refresh()
+
+    def is_loaded(self, chain_id):
+        return chain_id in self._loaded_chains
+
+    def remember(self, chain_id, token_input, address, decimals, price):
+        """Keep the result of a single `/v1/token` lookup."""
+        with self._lock:
+            self._resolved[(chain_id, token_input)] = {
+                "address": address,
+                "decimals": decimals,
+                "priceUSD": price,
+            }
+
+    def lookup(self, chain_id, token_input):
+        """Return (address, decimals, priceUSD) from memory, or None if unknown."""
+        with self._lock:
+            entry = (
+                self._resolved.get((chain_id, token_input))
+                or self._by_address.get((chain_id, _address_key(token_input)))
+                or self._by_symbol.get((chain_id, token_input.upper()))
+            )
+        if entry is None:
+            return None
+        return entry["address"], entry["decimals"], entry["priceUSD"]
+
+    def resolve(self, chain_id, token_input):
+        """Resolve a symbol or address, falling back to `/v1/token` on a miss."""
+        try:
+            self.load_chain(chain_id)
+        except Exception:
+            pass  # the single-token endpoint below still works
+
+        found = self.lookup(chain_id, token_input)
+        if found is not None:
+            return found
+
+        address, decimals, price = resolve_token(chain_id, token_input)
+        self.remember(chain_id, token_input, address, decimals, price)
+        return address, decimals, price
+
+    def resolve_many(self, queries, return_exceptions=False):
+        """
+        Resolve a list of (chain_id, token_input) pairs.
+        Cold queries (chain not loaded yet) are resolved concurrently.
+        With `return_exceptions`, failures are returned in place instead of raised.
+        """
+        def resolve(query):
+            try:
+                return self.resolve(*query)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        with self._lock:
+            cold = [q for q in queries if q[0] not in self._loaded_chains]
+        if len(cold) < 2:
+            return [resolve(query) for query in queries]
+
+        with ThreadPoolExecutor(max_workers=min(len(queries), pool_size())) as executor:
+            futures = [submit_in_context(executor, resolve, query) for query in queries]
+            return [future.result() for future in futures]
+
+    def refresh(self):
+        """Reload every loaded chain to pick up new prices."""
+        with self._lock:
+            chains = list(self._loaded_chains)
+        for chain_id in chains:
+            try:
+                self.index_chain(chain_id, self._fetch_chain(chain_id))
+            except Exception:
+                continue  # keep serving the previous prices
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start_refresh(self):
+        if not self.refresh_interval:
+            return
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name="token-registry-refresh", daemon=True
+            )
+        self._refresher.start()
+
+    def stop_refresh(self):
+        self._stop.set()
+        with self._lock:
+            refresher, self._refresher = self._refresher, None
+        if refresher is not None:
+            refresher.join()
+
+
+token_registry = TokenRegistry()
+
+########################################
+### QUOTE CACHE
+########################################
+
+QUOTE_CACHE_SIZE = 1024
+QUOTE_CACHE_TTL = 30         # seconds, quotes move quickly so keep this in the 15-60s range
+QUOTE_BUCKET_WIDTH = 0.01    # amounts within 1% of each other share a cache entry
+
+
+def scale_quote(quote, amount, quoted_amount):
+    """Rescale a quote obtained for `quoted_amount` to a nearby `amount` (same efficiency)."""
+    quote = dict(quote)
+    if quoted_amount:
+        quote["expectedAmount"] = quote["expectedAmount"] * amount / quoted_amount
+    return quote
+
+
+class QuoteCache:
+    """
+    Bounded LRU cache of `/v1/quote` results with a TTL.
+
+    Entries are keyed on (fromChain, toChain, fromToken, toToken, order, amount bucket),
+    buckets are geometric so `bucket_width` is a relative width. A hit for a different
+    amount in the same bucket is rescaled to the requested amount with `scale`.
+    """
+
+    def __init__(self, maxsize=QUOTE_CACHE_SIZE, ttl=QUOTE_CACHE_TTL, bucket_width=QUOTE_BUCKET_WIDTH, scale=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.bucket_width = bucket_width
+        self.scale = scale or scale_quote
+        self._entries = OrderedDict()  # key -> (expires_at, amount, quote)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def bucket(self, amount):
+        if amount <= 0:
+            return 0
+        return math.floor(math.log(amount) / math.log1p(self.bucket_width))
+
+    def key(self, fromChain, toChain, fromToken, toToken, order, amount):
+        return (fromChain, toChain, fromToken, toToken, order, self.bucket(amount))
+
+    def get(self, key, amount):
+        """Return the cached quote rescaled to `amount`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, cached_amount, quote = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return self.scale(quote, amount, cached_amount)
+
+    def put(self, key, amount, quote, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), amount, quote)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+quote_cache = QuoteCache()
+
+
+def runtime_gauges():
+    """Current state of the shared caches and the rate limiter, exported with the metrics."""
+    gauges = {f"route_quote_cache_{name}": value for name, value in quote_cache.stats().items()}
+    gauges.update({f"route_routes_cache_{name}": value for name, value in routes_cache.stats().items()})
+    gauges.update({f"lifi_rate_limiter_{name}": value for name, value in rate_limiter.stats().items()})
+    gauges["route_coalesced_requests"] = inflight.shared
+    gauges.update({f"route_failure_cache_{name}": value for name, value in failure_cache.stats().items()})
+    gauges.update({f"route_circuit_breaker_{name}": value for name, value in circuit_breaker.stats().items()})
+    return gauges
+
+
+metrics.add_collector(runtime_gauges)
+
+
 ########################################
 ### FUNCTIONS
 ########################################
@@ -135,7 +919,7 @@ def get_chain_id(chain_name):
 
 def resolve_transfer_details(src_chain_name, dst_chain_name, src_token_symbol, dst_token_symbol, sending_amount):
    # 1. Get all chain IDs -  API (commented) or via list
-    #chain_resp = requests.get("https://li.quest/v1/chains?", headers=headers)
+    #chain_resp = requests.get("https://li.quest/v1/chains?", headers=settings.headers())
     #chains = chain_resp.json()
     #name_to_chain_id = {item["name"]: item["id"] for item in chains["chains"]}
     #src_chain_id = name_chain_id.get(src_chain_name)
@@ -147,9 +931,13 @@ def resolve_transfer_details(src_chain_name, dst_chain_name, src_token_symbol, d
     if src_chain_id is None or dst_chain_id is None:
         raise ValueError(f"Invalid chain name(s): {src_chain_name}, {dst_chain_name}")
 
-    # 2. Resolve tokens
-    src_token_address, src_decimals, src_price  = resolve_token(src_chain_id, src_token_symbol)
-    dst_token_address, dst_decimals, dst_price = resolve_token(dst_chain_id, dst_token_symbol)
+    # 2. Resolve tokens (from the in-memory registry, concurrently when cold)
+    (src_token_address, src_decimals, src_price), (dst_token_address, dst_decimals, dst_price) = (
+        token_registry.resolve_many([
+            (src_chain_id, src_token_symbol),
+            (dst_chain_id, dst_token_symbol),
+        ])
+    )
 
     # 3. Convert sending amount
     if src_decimals is not None:
@@ -168,56 +956,136 @@ def resolve_transfer_details(src_chain_name, dst_chain_name, src_token_symbol, d
     }
 
 
-def jumper_quote(originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, order):
-
-    from_address = get_default_address_for_chain(originChain)
-    to_address = get_default_address_for_chain(destinationChain)
-
-    payload = {
+def build_quote_params(originChain, destinationChain, originToken, destinationToken, amount, order):
+    """Query parameters of a li.quest `/v1/quote` request."""
+    return {
         "fromChain": originChain,
         "toChain": destinationChain,
         "fromToken": originToken,
         "toToken": destinationToken,
-        "fromAddress": from_address,
-        "toAddress": to_address,
+        "fromAddress": get_default_address_for_chain(originChain),
+        "toAddress": get_default_address_for_chain(destinationChain),
         "fromAmount": int(amount),
         "order": order
     }
 
-    lifi_response = requests.get(
-        "https://li.quest/v1/quote",
-        headers=headers,
-        params=payload,
-        #timeout=10
+
+def parse_quote(lifi, originChain, destinationChain, originToken, destinationToken, price_from_amount, price_to_amount):
+    """Turn a li.quest `/v1/quote` response into a route step."""
+    tool = lifi["tool"]
+    to_amount = int(lifi["estimate"]["toAmount"]) / (10 ** lifi["action"]["toToken"]["decimals"])
+    to_amount_usd = to_amount * float(price_to_amount)
+    from_amount_usd = float(price_from_amount) * int(lifi["estimate"]["fromAmount"]) / (10 ** lifi["action"]["fromToken"]["decimals"])
+
+    jumper_link = (
+            f"https://jumper.exchange/?"
+            f"fromChain={originChain}&fromToken={originToken}"
+            f"&toChain={destinationChain}&toToken={destinationToken}"
+        )
+
+    return {
+        "project": "Jumper",
+        "tool":tool,
+        "expectedAmount": to_amount,
+        "efficiency": to_amount_usd / from_amount_usd,
+        "time": lifi["estimate"]["executionDuration"],
+        "link": jumper_link
+    }
+
+
+def jumper_quote(originChain, destinationChain, originToken, destinationToken, amount, price_from_amount, price_to_amount, order, fresh=False):
+    """
+    Quote one hop. Results are served from `quote_cache` unless `fresh` is set.
+    Raises HopUnavailable without calling li.quest if the same hop failed recently
+    (`failure_cache`, also skipped by `fresh`) or its chain pair is open in `circuit_breaker`.
+    """
+
+    cache_key = quote_cache.key(originChain, destinationChain, originToken, destinationToken, order, amount)
+    if not fresh:
+        cached = quote_cache.get(cache_key, amount)
+        if cached is not None:
+            tracer.current().set(cache="hit")
+            return cached
+        reason = failure_cache.get(failure_key(originChain, destinationChain, originToken, destinationToken, order, amount))
+        if reason is not None:
+            tracer.current().set(cache="failure")
+            raise HopUnavailable(f"{reason} (cached)", definitive=True)
+
+    if not circuit_breaker.allow((originChain, destinationChain)):
+        raise HopUnavailable(f"Circuit open for chain {originChain} -> {destinationChain} after repeated failures")
+
+    payload = build_quote_params(originChain, destinationChain, originToken, destinationToken, amount, order)
+
+    # Identical quotes already in flight (other strategies or sessions) are shared
+    lifi = inflight.do(("quote",) + tuple(payload.items()), _fetch_quote, payload)
+
+    quote = parse_quote(
+        lifi,
+        originChain, destinationChain, originToken, destinationToken,
+        price_from_amount, price_to_amount
     )
+    quote_cache.put(cache_key, amount, quote)
+    return quote
+
 
+def _fetch_quote(payload):
+    """
+    Fetch a quote, recording the outcome in the circuit breaker (errors and 5xx)
+    and the failure cache (definitive 4xx).
+    """
+    pair = (payload["fromChain"], payload["toChain"])
+    try:
+        lifi_response = lifi_get("/v1/quote", payload)
+    except Exception:
+        circuit_breaker.failure(pair)
+        raise
     if lifi_response.status_code == 200:
-        lifi = lifi_response.json()
-        
-        tool = lifi["tool"]
-        to_amount = int(lifi["estimate"]["toAmount"]) / (10 ** lifi["action"]["toToken"]["decimals"])
-        to_amount_usd = to_amount * float(price_to_amount)
-        from_amount_usd = float(price_from_amount) * int(lifi["estimate"]["fromAmount"]) / (10 ** lifi["action"]["fromToken"]["decimals"])
-        
-        jumper_link = (
-                f"https://jumper.exchange/?"
-                f"fromChain={originChain}&fromToken={originToken}"
-                f"&toChain={destinationChain}&toToken={destinationToken}"
-            )
-        
-        result = {
-            "project": "Jumper",
-            "tool":tool,
-            "expectedAmount": to_amount,
-            "efficiency": to_amount_usd / from_amount_usd,
-            "time": lifi["estimate"]["executionDuration"],
-            "link": jumper_link
-        }
-        return result
+        circuit_breaker.success(pair)
+        return lifi_response.json()
+
+    if lifi_response.status_code >= 500:
+        circuit_breaker.failure(pair)
     else:
-        return {}
+        circuit_breaker.answered(pair)
+    error = http_failure(lifi_response, f"No quote from chain {pair[0]} to {pair[1]}")
+    if error.definitive:
+        failure_cache.put(failure_key(
+            payload["fromChain"], payload["toChain"], payload["fromToken"], payload["toToken"],
+            payload["order"], payload["fromAmount"]
+        ), str(error))
+    raise error
+
+def quote_hop(src_chain, dst_chain, src_token, dst_token, amount, order, fresh=False):
+    """Resolve the tokens of one hop and quote it. Raises if no quote is available."""
+    with tracer.span("hop", src_chain=src_chain, dst_chain=dst_chain, src_token=src_token,
+                     dst_token=dst_token, amount=amount) as span:
+        if span.recording and queued_seconds() is not None:
+            span.set(executor_wait_ms=round(queued_seconds() * 1000, 3))
+        details = resolve_transfer_details(src_chain, dst_chain, src_token, dst_token, amount)
+        quote = jumper_quote(
+            originChain=details["src_chain_id"],
+            destinationChain=details["dst_chain_id"],
+            originToken=details["src_token_address"],
+            destinationToken=details["dst_token_address"],
+            amount=details["sending_amount"],
+            price_from_amount=details["price_from_amount"],
+            price_to_amount=details["price_to_amount"],
+            order = order,
+            fresh = fresh
+        )
+        span.set(tool=quote["tool"], efficiency=quote["efficiency"])
+        return quote, details
+
+
+def run_multistep_route(route_plan, initial_amount, order, fresh=False, speculative=False):
+        if speculative and len(route_plan) > 1:
+            # A single plan is a DAG with one path: quote all hops at once, fix up the misses
+            dag = HopDag([{"plan": route_plan}])
+            with route_executor.session(request_priority.get(), limit=len(route_plan)) as executor:
+                for _, route, _ in run_hop_dag(dag, initial_amount, order, executor, fresh, speculative=True):
+                    return route
+            return None
 
-def run_multistep_route(route_plan, initial_amount, order):
         steps = []
         current_amount = initial_amount
         total_time = 0
@@ -227,18 +1095,7 @@ def run_multistep_route(route_plan, initial_amount, order):
         for src_chain, dst_chain, src_token, dst_token in route_plan:
             
             try:
-                details = resolve_transfer_details(src_chain, dst_chain, src_token, dst_token, current_amount)
-                quote = jumper_quote(
-                    originChain=details["src_chain_id"],
-                    destinationChain=details["dst_chain_id"],
-                    originToken=details["src_token_address"],
-                    destinationToken=details["dst_token_address"],
-                    amount=details["sending_amount"],
-                    price_from_amount=details["price_from_amount"],
-                    price_to_amount=details["price_to_amount"],
-                    order = order
-                )
-                print(quote)
+                quote, details = quote_hop(src_chain, dst_chain, src_token, dst_token, current_amount, order, fresh)
                 steps.append(quote)
                 current_amount = quote["expectedAmount"]
                 total_time += quote["time"]
@@ -248,17 +1105,21 @@ def run_multistep_route(route_plan, initial_amount, order):
                     usd_in = float(details["price_from_amount"]) * initial_amount
                 usd_out = float(details["price_to_amount"]) * current_amount
             except Exception:
-                return None
+                return None  # the hop span records why
 
         if not steps:
             return None
 
-        return {
-            "steps": steps,
-            "finalAmountUSD": usd_out,
-            "totalTime": total_time,
-            "cumulativeEfficiency": f"{(usd_out / usd_in) * 100:.4f}%" if usd_in and usd_out else "N/A"
-        }
+        return route_summary(steps, total_time, usd_in, usd_out)
+
+
+def route_summary(steps, total_time, usd_in, usd_out):
+    return {
+        "steps": steps,
+        "finalAmountUSD": usd_out,
+        "totalTime": total_time,
+        "cumulativeEfficiency": f"{(usd_out / usd_in) * 100:.4f}%" if usd_in and usd_out else "N/A"
+    }
 
 
 def find_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order):
@@ -339,96 +1200,111 @@ def find_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amoun
 
 
 
-def find_best_routes_parallel(src_chain_name, dst_chain_name, src_token, dst_token, amount, order):
+def build_route_plans(src_chain_name, dst_chain_name, src_token, dst_token):
+    """
+    Hop plans of every routing strategy, as (src_chain, dst_chain, src_token, dst_token) tuples.
+    A strategy result is only kept if it completed at least `min_steps` hops.
+    """
     base_chain = "Base"
     base_native = get_native_token_address(base_chain)
     src_native = get_native_token_address(src_chain_name)
     dst_native = get_native_token_address(dst_chain_name)
 
-    def get_efficiency(result):
-        try:
-            return float(result.get("cumulativeEfficiency", "0%").replace('%', ''))
-        except:
-            return 0
-
-    def strategy_direct():
-        return {
-            "type": "direct",
-            "description": "Direct quote found.",
-            **run_multistep_route([
-                (src_chain_name, dst_chain_name, src_token, dst_token)
-            ], amount, order)
-        }
+    strategies = [{
+        "type": "direct",
+        "description": "Direct quote found.",
+        "plan": [(src_chain_name, dst_chain_name, src_token, dst_token)],
+        "min_steps": 1,
+    }]
 
-    def strategy_native_bridge():
-        plan = []
-        if src_token != src_native:
-            plan.append((src_chain_name, src_chain_name, src_token, src_native))
-        plan.append((src_chain_name, dst_chain_name, src_native, dst_native))
-        if dst_token != dst_native:
-            plan.append((dst_chain_name, dst_chain_name, dst_native, dst_token))
+    # Native bridge (swap → bridge → swap)
+    plan = []
+    if src_token != src_native:
+        plan.append((src_chain_name, src_chain_name, src_token, src_native))
+    plan.append((src_chain_name, dst_chain_name, src_native, dst_native))
+    if dst_token != dst_native:
+        plan.append((dst_chain_name, dst_chain_name, dst_native, dst_token))
+    strategies.append({
+        "type": "native_bridge",
+        "description": "Swap to native, bridge, swap from native.",
+        "plan": plan,
+        "min_steps": 2,
+    })
 
-        result = run_multistep_route(plan, amount, order)
-        if result and len(result["steps"]) >= 2:
-            return {
-                "type": "native_bridge",
-                "description": "Swap to native, bridge, swap from native.",
-                **result
-            }
+    if src_chain_name == base_chain or dst_chain_name == base_chain:
+        return strategies
 
-    def strategy_base_direct():
-        if src_chain_name == base_chain or dst_chain_name == base_chain:
-            return None
-        plan = [
+    # Via Base (direct bridge)
+    strategies.append({
+        "type": "via_base_direct",
+        "description": "Bridge to Base native, then to destination.",
+        "plan": [
             (src_chain_name, base_chain, src_token, base_native),
             (base_chain, dst_chain_name, base_native, dst_token)
-        ]
-        result = run_multistep_route(plan, amount, order)
-        if result:
-            return {
-                "type": "via_base_direct",
-                "description": "Bridge to Base native, then to destination.",
-                **result
-            }
+        ],
+        "min_steps": 1,
+    })
 
-    def strategy_base_with_native():
-        if src_chain_name == base_chain or dst_chain_name == base_chain:
-            return None
-        plan = []
-        if src_token != src_native:
-            plan.append((src_chain_name, src_chain_name, src_token, src_native))
-        plan.append((src_chain_name, base_chain, src_native, base_native))
-        plan.append((base_chain, dst_chain_name, base_native, dst_native))
-        if dst_token != dst_native:
-            plan.append((dst_chain_name, dst_chain_name, dst_native, dst_token))
+    # Via Base + native swaps
+    plan = []
+    if src_token != src_native:
+        plan.append((src_chain_name, src_chain_name, src_token, src_native))
+    plan.append((src_chain_name, base_chain, src_native, base_native))
+    plan.append((base_chain, dst_chain_name, base_native, dst_native))
+    if dst_token != dst_native:
+        plan.append((dst_chain_name, dst_chain_name, dst_native, dst_token))
+    strategies.append({
+        "type": "via_base_with_native",
+        "description": "Swap to native → Base → dst native → final token",
+        "plan": plan,
+        "min_steps": 3,
+    })
 
-        result = run_multistep_route(plan, amount, order)
-        if result and len(result["steps"]) >= 3:
-            return {
-                "type": "via_base_with_native",
-                "description": "Swap to native → Base → dst native → final token",
-                **result
-            }
+    return strategies
 
 
-    strategies = [
-        strategy_direct,
-        strategy_native_bridge,
-        strategy_base_direct,
-        strategy_base_with_native
-    ]
+def open_circuit(strategy):
+    """Chain pair of the first hop of `strategy` whose circuit is open, or None."""
+    for src_chain, dst_chain, _, _ in strategy["plan"]:
+        pair = (get_chain_id(src_chain), get_chain_id(dst_chain))
+        if circuit_breaker.is_open(pair):
+            return pair
+    return None
 
-    results = []
 
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        future_to_strategy = {executor.submit(fn): fn.__name__ for fn in strategies}
-        for future in as_completed(future_to_strategy):
-            try:
-                result = future.result()
-                if result and result.get("steps"):
-                    results.append(result)
-            except Exception:
-                continue
+def get_efficiency(result):
+    try:
+        return float(result.get("cumulativeEfficiency", "0%").replace('%', ''))
+    except (AttributeError, ValueError):
+        return 0
+
+
+def strategy_result(strategy, result):
+    """Tag a run_multistep_route result with its strategy, or None if it is incomplete."""
+    if result and len(result["steps"]) >= strategy["min_steps"]:
+        return {
+            "type": strategy["type"],
+            "description": strategy["description"],
+            **result
+        }
+
+
+def summarize_routes(results, stopped=()):
+    """
+    Pick the best of the strategy results, the others become alternatives.
+    `stopped` lists (strategy, status) pairs of strategies that did not finish
+    or were not run.
+    """
+    unfinished = [
+        {
+            "type": strategy["type"],
+            "description": strategy["description"],
+            "efficiency": "N/A",
+            "steps": [],
+            "status": status
+        }
+        for strategy, status in stopped
+    ]
 
     if results:
         best = max(results, key=get_efficiency)
@@ -439,14 +1315,14 @@ def find_best_routes_parallel(src_chain_name, dst_chain_name, src_token, dst_tok
                     "type": route["type"],
                     "description": route["description"],
                     "efficiency": f"{get_efficiency(route):.2f}%",
-                    "steps": route["steps"]
+                    "steps": route["steps"],
+                    "status": "ok"
                 }
                 for route in results if route != best
-            ]
+            ] + unfinished
     }
 
-
-    return {
+    summary = {
         "type": "unavailable",
         "description": "No available route found.",
         "steps": [],
@@ -454,5 +1330,620 @@ def find_best_routes_parallel(src_chain_name, dst_chain_name, src_token, dst_tok
         "totalTime": 0,
         "cumulativeEfficiency": "0%"
     }
+    if unfinished:
+        summary["alternatives"] = unfinished
+    return summary
+
+
+########################################
+### MULTI-ROUTE
+########################################
+
+# li.quest's /v1/advanced/routes returns several complete candidate routes in one
+# call, hops included. In multi-route mode they replace the hand-built strategies,
+# which only run when li.quest has no route.
+
+# Strategy type of li.quest's routes, followed by their rank in its answer
+LIFI_ROUTE_PREFIX = "lifi_route_"
+
+def scale_routes(routes, amount, quoted_amount):
+    """Rescale normalize_routes results obtained for `quoted_amount` to a nearby `amount`."""
+    ratio = amount / quoted_amount if quoted_amount else 1
+    return [
+        (strategy, {
+            **route,
+            "steps": [{**step, "expectedAmount": step["expectedAmount"] * ratio} for step in route["steps"]],
+            "finalAmountUSD": route["finalAmountUSD"] * ratio if route["finalAmountUSD"] else route["finalAmountUSD"],
+        })
+        for strategy, route in routes
+    ]
+
+
+def decode_routes(routes):
+    """scale_routes input back from JSON (shared caches): pairs and plan hops are tuples again."""
+    return [
+        ({**strategy, "plan": [tuple(hop) for hop in strategy["plan"]]}, route)
+        for strategy, route in routes
+    ]
 
 
+# Normalised /v1/advanced/routes results, same keys and lifetime as quote_cache
+routes_cache = QuoteCache(scale=scale_routes)
+
+
+def build_routes_body(details, order):
+    """JSON body of a li.quest `/v1/advanced/routes` request, from resolve_transfer_details."""
+    return {
+        "fromChainId": details["src_chain_id"],
+        "toChainId": details["dst_chain_id"],
+        "fromTokenAddress": details["src_token_address"],
+        "toTokenAddress": details["dst_token_address"],
+        "fromAmount": str(int(details["sending_amount"])),
+        "fromAddress": get_default_address_for_chain(details["src_chain_id"]),
+        "toAddress": get_default_address_for_chain(details["dst_chain_id"]),
+        "options": {"order": order},
+    }
+
+
+def normalize_routes(lifi_routes, details, amount):
+    """
+    Turn the routes of a `/v1/advanced/routes` response into (strategy, route) pairs, as
+    run_hop_dag yields them: strategies "lifi_route_1", "lifi_route_2"... in li.quest's
+    order, with one (fromChain, toChain, fromToken, toToken) plan entry and one
+    parse_quote step per li.quest step.
+    """
+    routes = []
+    for i, lifi_route in enumerate(lifi_routes, 1):
+        plan = []
+        steps = []
+        for step in lifi_route["steps"]:
+            action = step["action"]
+            hop = (action["fromChainId"], action["toChainId"], action["fromToken"]["address"], action["toToken"]["address"])
+            plan.append(hop)
+            steps.append(parse_quote(step, *hop, action["fromToken"]["priceUSD"], action["toToken"]["priceUSD"]))
+        if not steps:
+            continue
+        tags = ", ".join(tag.lower() for tag in lifi_route.get("tags", []))
+        strategy = {
+            "type": f"{LIFI_ROUTE_PREFIX}{i}",
+            "description": "li.quest route via " + " → ".join(step["tool"] for step in steps) + (f" ({tags})" if tags else ""),
+            "plan": plan,
+            "min_steps": 1,
+        }
+        usd_in = float(details["price_from_amount"]) * amount
+        usd_out = float(details["price_to_amount"]) * steps[-1]["expectedAmount"]
+        routes.append((strategy, route_summary(steps, sum(step["time"] for step in steps), usd_in, usd_out)))
+    return routes
+
+
+def multi_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh=False):
+    """
+    Candidate routes of li.quest's `/v1/advanced/routes` in one call, as normalize_routes
+    (strategy, route) pairs. Results are served from `routes_cache` unless `fresh` is set.
+    Raises if the call fails.
+    """
+    with tracer.span("routes", src_chain=src_chain_name, dst_chain=dst_chain_name, src_token=src_token,
+                     dst_token=dst_token, amount=amount) as span:
+        details = resolve_transfer_details(src_chain_name, dst_chain_name, src_token, dst_token, amount)
+        cache_key = routes_cache.key(
+            details["src_chain_id"], details["dst_chain_id"],
+            details["src_token_address"], details["dst_token_address"], order, amount
+        )
+        if not fresh:
+            cached = routes_cache.get(cache_key, amount)
+            if cached is not None:
+                span.set(cache="hit", routes=len(cached))
+                return cached
+
+        body = build_routes_body(details, order)
+        try:
+            lifi_routes = inflight.do(("routes",) + tuple((k, str(v)) for k, v in body.items()), _fetch_routes, body)
+        except HopUnavailable as e:
+            if e.definitive:
+                routes_cache.put(cache_key, amount, [])  # same answer until it expires, go straight to the strategies
+            raise
+        routes = normalize_routes(lifi_routes, details, amount)
+        routes_cache.put(cache_key, amount, routes)
+        span.set(routes=len(routes))
+        return routes
+
+
+def _fetch_routes(body):
+    response = lifi_post("/v1/advanced/routes", body)
+    if response.status_code != 200:
+        raise http_failure(response, f"No routes from chain {body['fromChainId']} to {body['toChainId']}")
+    return response.json().get("routes", [])
+
+
+########################################
+### HOP DAG
+########################################
+
+# Speculative mode: value kept by a hop when projecting amounts, and the relative
+# gap between projected and actual input above which a hop is quoted again
+SPECULATIVE_HOP_EFFICIENCY = 0.995
+SPECULATIVE_TOLERANCE = 0.01
+
+# Multi-route mode: share of the latency budget li.quest's routes are waited for,
+# the fallback strategies get the rest
+ROUTES_DEADLINE_SHARE = 0.5
+
+class HopNode:
+    """A unique hop request: its input amount is the output of its parent hop."""
+
+    def __init__(self, hop, parent):
+        self.hop = hop          # (src_chain, dst_chain, src_token, dst_token)
+        self.parent = parent
+        self.children = {}      # hop -> HopNode
+        self.strategies = []    # strategies whose plan ends with this hop
+        self.quote = None
+        self.details = None
+        self.attempted = False
+        self.input = None        # actual input amount, known once the parent is quoted
+        self.projected = None    # projected input amount (speculative mode)
+        self.speculation = None  # future of the speculative quote
+        self.efficiency = None   # product of the hop efficiencies down to this hop
+        self.error = None        # exception of the quote, if the hop failed
+
+    def path(self):
+        """Nodes from the first hop down to this one."""
+        nodes = []
+        node = self
+        while node.hop is not None:
+            nodes.append(node)
+            node = node.parent
+        return nodes[::-1]
+
+
+class HopDag:
+    """
+    The hop plans of all strategies of one query, merged on their common prefixes.
+    Two strategies starting with the same hops share those hop quotes, since they
+    also share the amounts sent through them.
+    """
+
+    def __init__(self, strategies):
+        self.root = HopNode(None, None)
+        self.root.efficiency = 1.0
+        self.leaves = []
+        self.hops_requested = 0
+        self.hops_quoted = 0
+        self.hops_requoted = 0
+        self.nodes = 0
+        for strategy in strategies:
+            node = self.root
+            for hop in strategy["plan"]:
+                if hop not in node.children:
+                    node.children[hop] = HopNode(hop, node)
+                    self.nodes += 1
+                node = node.children[hop]
+            node.strategies.append(strategy)
+            self.leaves.append(node)
+            self.hops_requested += len(strategy["plan"])
+
+    def failure(self, strategy):
+        """Exception of the first failed hop on the path of `strategy`, or None."""
+        for leaf in self.leaves:
+            if strategy in leaf.strategies:
+                return next((node.error for node in leaf.path() if node.error is not None), None)
+        return None
+
+    def stats(self):
+        # Run on its own, a strategy quotes its hops until the first failure,
+        # which is exactly the attempted part of its path
+        standalone = sum(
+            sum(1 for node in leaf.path() if node.attempted)
+            for leaf in self.leaves
+        )
+        return {
+            "hops_requested": self.hops_requested,
+            "unique_hops": self.nodes,
+            "hops_quoted": self.hops_quoted,
+            "hops_requoted": self.hops_requoted,
+            "calls_saved": standalone - self.hops_quoted,
+        }
+
+
+def _node_route(node, initial_amount):
+    """Build the run_multistep_route-style result of the path ending at `node`."""
+    path = node.path()
+    steps = [n.quote for n in path]
+    usd_in = float(path[0].details["price_from_amount"]) * initial_amount
+    usd_out = float(node.details["price_to_amount"]) * node.quote["expectedAmount"]
+    return route_summary(steps, sum(step["time"] for step in steps), usd_in, usd_out)
+
+
+def _subtree_strategies(node):
+    strategies = list(node.strategies)
+    for child in node.children.values():
+        strategies += _subtree_strategies(child)
+    return strategies
+
+
+def project_hop_amounts(dag, amount):
+    """
+    Project the input amount of every hop from token prices, assuming each hop
+    keeps SPECULATIVE_HOP_EFFICIENCY of the value. Hops whose prices cannot be
+    resolved get no projection.
+    """
+    tokens = set()
+    stack = list(dag.root.children.values())
+    while stack:
+        node = stack.pop()
+        src_chain, dst_chain, src_token, dst_token = node.hop
+        tokens.add((get_chain_id(src_chain), src_token))
+        tokens.add((get_chain_id(dst_chain), dst_token))
+        stack.extend(node.children.values())
+
+    tokens = list(tokens)
+    prices = {}
+    for query, resolved in zip(tokens, token_registry.resolve_many(tokens, return_exceptions=True)):
+        if not isinstance(resolved, Exception) and resolved[2] is not None:
+            prices[query] = float(resolved[2])
+
+    # Breadth first, so first hops come first in the returned (submission) order
+    projected = {}
+    level = [(child, amount) for child in dag.root.children.values()]
+    while level:
+        next_level = []
+        for node, node_amount in level:
+            projected[node] = node_amount
+            src_chain, dst_chain, src_token, dst_token = node.hop
+            price_in = prices.get((get_chain_id(src_chain), src_token))
+            price_out = prices.get((get_chain_id(dst_chain), dst_token))
+            if price_in and price_out:
+                output = node_amount * price_in / price_out * SPECULATIVE_HOP_EFFICIENCY
+                next_level.extend((child, output) for child in node.children.values())
+        level = next_level
+    return projected
+
+
+class Wait:
+    """
+    Step of a quoting generator (hop_dag_steps, query_steps...): resume it once one of
+    `futures` is done or `deadline` (a time.monotonic() timestamp) passes.
+    """
+
+    def __init__(self, futures, deadline=None):
+        self.futures = futures
+        self.deadline = deadline
+
+    def timeout(self):
+        return None if self.deadline is None else max(0, self.deadline - time.monotonic())
+
+
+def drive(steps):
+    """
+    Run a step generator in this thread: block on its Wait steps, yield its other items.
+    routing/async_engine.py drives the same generators on an event loop instead.
+    """
+    try:
+        for step in steps:
+            if isinstance(step, Wait):
+                wait_futures(step.futures, step.timeout(), FIRST_COMPLETED)
+            else:
+                yield step
+    finally:
+        steps.close()
+
+
+def run_steps(steps):
+    """Run a step generator that only yields Wait steps in this thread and return its value."""
+    try:
+        while True:
+            try:
+                step = next(steps)
+            except StopIteration as stop:
+                return stop.value
+            wait_futures(step.futures, step.timeout(), FIRST_COMPLETED)
+    finally:
+        steps.close()
+
+
+def hop_dag_steps(dag, amount, order, executor, fresh=False, speculative=False, tolerance=SPECULATIVE_TOLERANCE,
+                  deadline=None, prune=False):
+    """
+    Quote every unique hop of `dag` once. A hop is scheduled as soon as the amount
+    it sends is known, i.e. when its parent hop is quoted.
+
+    With `speculative`, every hop is quoted up front in parallel at an amount projected
+    from token prices. Once the actual input of a hop is known, its speculative quote is
+    kept (rescaled to the actual input) if the projection was within `tolerance`,
+    otherwise the hop is quoted again with the actual amount.
+
+    `deadline` is a time.monotonic() timestamp: when it passes, outstanding quotes are
+    cancelled (or dropped if already running) and the generator stops. With `prune`,
+    hops below a partial path whose efficiency is already no better than the best
+    completed route are not quoted, since hop efficiencies are at most 1.
+
+    Yields (strategy, route, status) as each strategy completes, with status "ok",
+    "failed" (route is None) or "pruned" (route is None), and a Wait step whenever
+    it has nothing to do until a quote lands (see drive).
+    """
+    outstanding = {}  # future -> (node, kind)
+    projection = None
+    best_efficiency = 0.0
+
+    def submit(node, node_amount, kind):
+        dag.hops_quoted += 1
+        node.attempted = True
+        src_chain, dst_chain, src_token, dst_token = node.hop
+        future = submit_in_context(executor, quote_hop, src_chain, dst_chain, src_token, dst_token, node_amount, order, fresh)
+        outstanding[future] = (node, kind)
+
+    def settle(node):
+        """The input of `node` is known: accept its speculation, wait for it, or re-quote."""
+        projected = node.projected
+        if projected is None:
+            submit(node, node.input, "exact")
+            return "pending"
+        if node.speculation is None:
+            return "pending"  # settled again when the speculative quote lands
+
+        deviation = abs(node.input - projected) / projected if projected else float("inf")
+        if node.speculation.exception() is None and deviation <= tolerance:
+            quote, node.details = node.speculation.result()
+            node.quote = scale_quote(quote, node.input, projected)
+            return "done"
+        if node.speculation.exception() is not None and node.input == projected:
+            return "failed"  # an exact re-quote would fail the same way
+
+        dag.hops_requoted += 1
+        submit(node, node.input, "exact")
+        return "pending"
+
+    try:
+        if deadline is not None and time.monotonic() >= deadline:
+            return  # e.g. the planner used up the budget, nothing would land in time
+        for child in dag.root.children.values():
+            child.input = amount
+        if speculative:
+            # Token prices may need a request: resolved on the executor, like the quotes
+            projection = submit_in_context(executor, project_hop_amounts, dag, amount)
+            while not projection.done():
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                yield Wait([projection], deadline)
+            for node, node_amount in projection.result().items():
+                node.projected = node_amount
+                submit(node, node_amount, "speculative")
+            for child in dag.root.children.values():
+                settle(child)
+        else:
+            for child in dag.root.children.values():
+                submit(child, amount, "exact")
+
+        while outstanding:
+            finished = [future for future in outstanding if future.done()]
+            if not finished:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                yield Wait(list(outstanding), deadline)
+                continue
+
+            for future in finished:
+                node, kind = outstanding.pop(future)
+                if kind == "speculative":
+                    node.speculation = future
+                    state = settle(node) if node.input is not None else "pending"
+                elif future.exception() is not None:
+                    state = "failed"
+                else:
+                    node.quote, node.details = future.result()
+                    state = "done"
+
+                if state == "failed":
+                    node.error = future.exception()
+                    for strategy in _subtree_strategies(node):
+                        yield strategy, None, "failed"
+                    continue
+
+                settled = [node] if state == "done" else []
+                while settled:
+                    node = settled.pop()
+                    node.efficiency = node.parent.efficiency * node.quote["efficiency"]
+                    for strategy in node.strategies:
+                        best_efficiency = max(best_efficiency, node.efficiency)
+                        yield strategy, _node_route(node, amount), "ok"
+
+                    if prune and node.efficiency <= best_efficiency:
+                        for child in node.children.values():
+                            for strategy in _subtree_strategies(child):
+                                yield strategy, None, "pruned"
+                        continue
+
+                    for child in node.children.values():
+                        child.input = node.quote["expectedAmount"]
+                        if not speculative:
+                            submit(child, child.input, "exact")
+                            continue
+                        child_state = settle(child)
+                        if child_state == "done":
+                            settled.append(child)
+                        elif child_state == "failed":
+                            child.error = child.speculation.exception()
+                            for strategy in _subtree_strategies(child):
+                                yield strategy, None, "failed"
+    finally:
+        if projection is not None:
+            projection.cancel()
+        for future in outstanding:
+            future.cancel()
+
+
+def run_hop_dag(dag, amount, order, executor, fresh=False, speculative=False, tolerance=SPECULATIVE_TOLERANCE,
+                deadline=None, prune=False):
+    """hop_dag_steps (same parameters) run in this thread: yields (strategy, route, status)."""
+    return drive(hop_dag_steps(dag, amount, order, executor, fresh, speculative, tolerance, deadline, prune))
+
+
+def query_steps(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh=False, speculative=False,
+                deadline_ms=None, prune=False, multi_route=False, planner=False):
+    """iter_best_routes (same parameters and events) as a step generator, see drive."""
+    if query_hooks and request_priority.get() == PRIORITY_INTERACTIVE:
+        for hook in query_hooks:
+            hook(src_chain_name, dst_chain_name, src_token, dst_token, amount, order)
+
+    started = time.monotonic()
+    deadline = None if deadline_ms is None else started + deadline_ms / 1000
+
+    # Not entered: hops run under it through span.run, the caller's context is left alone
+    span = tracer.span("query", src_chain=src_chain_name, dst_chain=dst_chain_name, src_token=src_token,
+                       dst_token=dst_token, amount=amount, order=order, speculative=speculative, prune=prune,
+                       multi_route=multi_route, planner=planner)
+
+    routes = []
+    lifi_routes = 0
+    planner_quotes = 0
+    strategies = []
+    dag = HopDag([])
+    results = []
+    finished = set()
+    stopped = []
+    best = None
+
+    executor = route_executor.session(request_priority.get(), limit=MAX_WORKERS)
+    try:
+        if multi_route:
+            # The strategies keep the rest of the budget if li.quest is slow or fails. A call
+            # still running is not waited for, but fills routes_cache for the next query.
+            routes_deadline = None if deadline is None else started + deadline_ms / 1000 * ROUTES_DEADLINE_SHARE
+            future = span.run(submit_in_context, executor, multi_routes, src_chain_name, dst_chain_name,
+                              src_token, dst_token, amount, order, fresh)
+            while not future.done() and (routes_deadline is None or time.monotonic() < routes_deadline):
+                yield Wait([future], routes_deadline)
+            if not future.done():
+                span.set(routes_error="timed out")
+            elif future.exception() is None:
+                routes = future.result()
+            # else the routes span records why, the hand-built strategies take over
+        lifi_routes = len(routes)
+
+        if planner and not routes:
+            from routing.route_planner import plan_route_steps
+            try:
+                routes, planner_quotes = yield from span.iterate(plan_route_steps(
+                    src_chain_name, dst_chain_name, src_token, dst_token, amount, order, executor,
+                    fresh=fresh, deadline=deadline
+                ))
+            except Exception as e:
+                span.set(planner_error=str(e))
+
+        skipped = []
+        if routes:
+            strategies = [strategy for strategy, _ in routes]
+        else:
+            for strategy in build_route_plans(src_chain_name, dst_chain_name, src_token, dst_token):
+                pair = open_circuit(strategy)
+                if pair is None:
+                    strategies.append(strategy)
+                else:
+                    skipped.append((strategy, f"Circuit open for chain {pair[0]} -> {pair[1]}"))
+            dag = HopDag(strategies)
+
+        for strategy, reason in skipped:
+            stopped.append((strategy, "skipped"))
+            record_strategy(span, strategy, "skipped", reason)
+            yield {"done": False, "type": strategy["type"], "status": "skipped", "route": None, "best": None}
+
+        if routes:
+            hops = ((strategy, route, "ok") for strategy, route in routes)
+        else:
+            hops = hop_dag_steps(dag, amount, order, executor, fresh, speculative, deadline=deadline, prune=prune)
+        for item in span.iterate(hops):
+            if isinstance(item, Wait):
+                yield item
+                continue
+            strategy, route, status = item
+            finished.add(strategy["type"])
+            record_strategy(span, strategy, status, dag.failure(strategy) if status == "failed" else None)
+            result = strategy_result(strategy, route)
+            if result and result.get("steps"):
+                results.append(result)
+                if best is None or get_efficiency(result) > get_efficiency(best):
+                    best = result
+            else:
+                result = None
+                if status == "pruned":
+                    stopped.append((strategy, "pruned"))
+            yield {"done": False, "type": strategy["type"], "status": status, "route": result, "best": best}
+    except BaseException as e:
+        span.fail("abandoned" if isinstance(e, GeneratorExit) else e)
+        span.end()
+        raise
+    finally:
+        # Don't wait for quotes still running past the deadline, their results are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    stopped += [(strategy, "timed_out") for strategy in strategies if strategy["type"] not in finished]
+    for strategy, status in stopped:
+        if status == "timed_out":
+            record_strategy(span, strategy, status)
+
+    summary = summarize_routes(results, stopped)
+    summary["stats"] = dag.stats()
+    if multi_route:
+        summary["stats"]["multi_routes"] = lifi_routes
+    if planner:
+        summary["stats"]["planner_quotes"] = planner_quotes
+    span.set(best=summary.get("best", {}).get("type"), **summary["stats"])
+    span.end()
+    if span.recording:
+        summary["trace"] = span.to_dict()
+    yield {"done": True, "result": summary}
+
+
+def iter_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh=False, speculative=False,
+                     deadline_ms=None, prune=False, multi_route=False, planner=False):
+    """
+    Streaming version of find_best_routes_parallel (same parameters).
+
+    Yields one event per strategy as soon as it finishes:
+        {"done": False, "type": ..., "status": "ok" | "failed" | "pruned" | "skipped",
+         "route": strategy result or None, "best": best route so far or None}
+    then a last {"done": True, "result": ...} event with the find_best_routes_parallel result.
+    Strategies going through a chain pair whose circuit is open are "skipped" up front.
+    In multi-route mode the events are the li.quest routes ("lifi_route_1"...), in planner
+    mode the routes found by the route planner ("direct", "via_..."), all at once.
+    """
+    return drive(query_steps(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh,
+                             speculative, deadline_ms, prune, multi_route, planner))
+
+
+def record_strategy(span, strategy, status, error=None):
+    """Strategy span below the query `span`, from the query start to the strategy outcome."""
+    if not span.recording:
+        return
+    span.run(tracer.record, "strategy", span.start, status=status, error=error,
+             strategy=strategy["type"], hops=len(strategy["plan"]))
+    metrics.inc("route_strategies_total", strategy=strategy["type"], status=status)
+
+
+def find_best_routes_parallel(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, fresh=False, speculative=False,
+                              deadline_ms=None, prune=False, on_result=None, multi_route=False, planner=False):
+    """
+    Run every strategy in parallel and return the best route and its alternatives.
+    Hops shared by several strategies are quoted once, see HopDag; "stats" reports
+    how many quote calls that saved. Set `fresh` to bypass the quote cache and
+    `speculative` to quote downstream hops before their input amount is known.
+
+    With `deadline_ms`, the best route found within that budget is returned and the
+    strategies still running are listed as "timed_out" in the alternatives. With
+    `prune`, strategies that can no longer beat the best route are stopped early
+    and listed as "pruned". Strategies through a chain pair that keeps failing are
+    not run while its circuit is open (see CircuitBreaker) and listed as "skipped".
+
+    With `multi_route`, li.quest's `/v1/advanced/routes` is asked for complete candidate
+    routes in one call, which become the best route and alternatives ("lifi_route_1"...).
+    The hand-built strategies only run if it has none or fails. With `planner`, the
+    beam search of routing/route_planner.py over the hub assets replaces the hand-built
+    strategies the same way (after the li.quest routes, if both are set).
+
+    `on_result` is called with each iter_best_routes event as strategies finish.
+    """
+    for event in iter_best_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                                  fresh, speculative, deadline_ms, prune, multi_route, planner):
+        if event["done"]:
+            return event["result"]
+        if on_result is not None:
+            on_result(event)
@@ -0,0 +1,207 @@
+
+########################################
+### LIBRARY
+########################################
+
+import time
+
+from routing.route_finder import (
+    MAX_WORKERS,
+    Wait,
+    get_native_token_address,
+    quote_hop,
+    request_priority,
+    route_summary,
+    run_steps,
+    strategy_result,
+    submit_in_context,
+    summarize_routes,
+)
+from routing.scheduler import route_executor
+
+
+########################################
+### CONFIG
+########################################
+
+# Intermediate (chain, token) hubs the planner may route through
+HUB_ASSETS = [
+    ("Base", "ETH"),
+    ("Arbitrum", "ETH"),
+    ("Arbitrum", "USDC"),
+    ("Ethereum", "WETH"),
+    ("Optimism", "ETH"),
+]
+
+MAX_HOPS = 3
+BEAM_WIDTH = 4       # partial paths kept after each depth
+MAX_QUOTES = 40      # quote budget of one query
+
+# Best efficiency a single hop can reach: a partial path can never end above
+# its current efficiency times this, which is what pruning relies on.
+MAX_HOP_EFFICIENCY = 1.0
+
+
+########################################
+### FUNCTIONS
+########################################
+
+def build_graph(src_chain_name, dst_chain_name, src_token, dst_token, hubs=None):
+    """
+    Nodes of the route graph as (chain, token) pairs: source, destination and the
+    intermediates (native tokens of both ends plus the hubs). Every pair of nodes is
+    connected, by a swap on the same chain or a bridge between two chains.
+    """
+    source = (src_chain_name, src_token)
+    destination = (dst_chain_name, dst_token)
+
+    intermediates = []
+    candidates = [
+        (src_chain_name, get_native_token_address(src_chain_name)),
+        (dst_chain_name, get_native_token_address(dst_chain_name)),
+        *(HUB_ASSETS if hubs is None else hubs),
+    ]
+    for node in candidates:
+        if node not in (source, destination) and node not in intermediates:
+            intermediates.append(node)
+
+    return source, destination, intermediates
+
+
+def _route_type(path):
+    hubs = path[1:-1]
+    if not hubs:
+        return "direct"
+    return "via_" + "_".join(f"{chain}_{token}".lower().replace(" ", "_") for chain, token in hubs)
+
+
+def _extend(partial, target, amount, order, fresh):
+    chain, token = partial["node"]
+    quote, details = quote_hop(chain, target[0], token, target[1], partial["amount"], order, fresh)
+    usd_in = partial["usd_in"] or float(details["price_from_amount"]) * amount
+    return {
+        "node": target,
+        "path": partial["path"] + [target],
+        "amount": quote["expectedAmount"],
+        "efficiency": partial["efficiency"] * quote["efficiency"],
+        "steps": partial["steps"] + [quote],
+        "time": partial["time"] + quote["time"],
+        "usd_in": usd_in,
+        "usd_out": float(details["price_to_amount"]) * quote["expectedAmount"],
+    }
+
+
+def plan_route_steps(src_chain_name, dst_chain_name, src_token, dst_token, amount, order, executor,
+                     hubs=None, max_hops=MAX_HOPS, beam_width=BEAM_WIDTH, max_quotes=MAX_QUOTES, fresh=False,
+                     deadline=None):
+    """
+    plan_routes as a step generator quoting on `executor`: yields Wait steps (see
+    route_finder.drive) and returns (routes, quotes used). `deadline` is a
+    time.monotonic() timestamp.
+    """
+    source, destination, intermediates = build_graph(src_chain_name, dst_chain_name, src_token, dst_token, hubs)
+
+    frontier = [{
+        "node": source, "path": [source], "amount": amount, "efficiency": 1.0,
+        "steps": [], "time": 0, "usd_in": None, "usd_out": None,
+    }]
+    complete = []
+    best_efficiency = 0.0
+    quotes_used = 0
+
+    for depth in range(1, max_hops + 1):
+        frontier = [p for p in frontier if p["efficiency"] * MAX_HOP_EFFICIENCY > best_efficiency]
+        if not frontier or quotes_used >= max_quotes:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+        # Edges to the destination first, then to unvisited intermediates
+        edges = [(partial, destination) for partial in frontier]
+        if depth < max_hops:
+            edges += [
+                (partial, node)
+                for partial in frontier
+                for node in intermediates
+                if node not in partial["path"]
+            ]
+        edges = edges[:max_quotes - quotes_used]
+        quotes_used += len(edges)
+
+        futures = [
+            submit_in_context(executor, _extend, partial, target, amount, order, fresh)
+            for partial, target in edges
+        ]
+        try:
+            while True:
+                pending = [future for future in futures if not future.done()]
+                if not pending or (deadline is not None and time.monotonic() >= deadline):
+                    break
+                yield Wait(pending, deadline)
+        finally:
+            for future in futures:
+                future.cancel()  # past the deadline: the edges not quoted yet are dropped
+
+        next_frontier = []
+        for future in futures:
+            if not future.done() or future.cancelled() or future.exception() is not None:
+                continue
+            extended = future.result()
+            if extended["node"] == destination:
+                complete.append(extended)
+                best_efficiency = max(best_efficiency, extended["efficiency"])
+            else:
+                next_frontier.append(extended)
+
+        next_frontier.sort(key=lambda p: p["efficiency"], reverse=True)
+        frontier = next_frontier[:beam_width]
+
+    routes = []
+    for route in complete:
+        path = route["path"]
+        strategy = {
+            "type": _route_type(path),
+            "description": " → ".join(f"{token} on {chain}" for chain, token in path),
+            "plan": [(src[0], dst[0], src[1], dst[1]) for src, dst in zip(path, path[1:])],
+            "min_steps": 1,
+        }
+        routes.append((strategy, route_summary(route["steps"], route["time"], route["usd_in"], route["usd_out"])))
+    return routes, quotes_used
+
+
+def plan_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                hubs=None, max_hops=MAX_HOPS, beam_width=BEAM_WIDTH, max_quotes=MAX_QUOTES, fresh=False,
+                deadline_ms=None):
+    """
+    Beam search over the (chain, token) graph for the best product of hop efficiencies.
+
+    Paths are extended one hop per depth, up to `max_hops`. Only the `beam_width` best
+    partial paths survive each depth, and partial paths whose efficiency upper bound is
+    already below the best complete route are dropped before being quoted. At most
+    `max_quotes` hops are quoted. With `deadline_ms`, no depth starts once it has passed
+    and the edges still being quoted are dropped. Returns the complete routes as
+    (strategy, route) pairs, as run_hop_dag yields them, and the number of quotes used.
+    """
+    deadline = None if deadline_ms is None else time.monotonic() + deadline_ms / 1000
+    executor = route_executor.session(request_priority.get(), limit=MAX_WORKERS)
+    try:
+        return run_steps(plan_route_steps(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                                          executor, hubs, max_hops, beam_width, max_quotes, fresh, deadline))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def find_best_routes_graph(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                           hubs=None, max_hops=MAX_HOPS, beam_width=BEAM_WIDTH, max_quotes=MAX_QUOTES, fresh=False,
+                           deadline_ms=None):
+    """
+    Best route found by plan_routes (same parameters), in the best/alternatives structure
+    of find_best_routes_parallel, plus the number of quotes used in "stats".
+    find_best_routes_parallel(..., planner=True) runs the same search.
+    """
+    routes, quotes_used = plan_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                                      hubs, max_hops, beam_width, max_quotes, fresh, deadline_ms)
+    results = [strategy_result(strategy, route) for strategy, route in routes]
+    summary = summarize_routes(results)
+    summary["stats"] = {"quotes": quotes_used, "routes": len(results)}
+    return summary
@@ -0,0 +1,229 @@
+"""
+Process-wide bounded executor shared by every route query.
+
+Each query gets its own handle from `route_executor.session()`, used like a
+ThreadPoolExecutor (submit, shutdown). All handles share one pool of at most
+`max_workers` threads, started on demand and stopped after a while idle, so N
+concurrent users no longer mean 4N threads started and torn down per query.
+
+Free workers take the next task from the queries of the lowest priority value
+(interactive before batch before warming), round-robin between queries of the
+same priority, and a query never has more than its `limit` tasks running. A
+query with many hops queued therefore delays the others by at most one task per
+turn instead of holding the pool until it is done.
+
+The pool size is read from ROUTE_WORKERS (default 32). Queueing delay and pool
+state are exported with the metrics (route_executor_*), and the delay of the task
+a worker is running with queued_seconds().
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait as wait_futures
+
+from routing.tracing import metrics
+
+
+DEFAULT_WORKERS = 32    # threads shared by all queries
+QUERY_WORKERS = 4       # tasks of one query running at once
+IDLE_TIMEOUT = 30       # seconds before an idle worker thread exits
+
+_local = threading.local()
+
+
+def queued_seconds():
+    """Time the task running on this thread waited for a worker, None outside of a FairExecutor."""
+    return getattr(_local, "queued", None)
+
+
+########################################
+### EXECUTOR
+########################################
+
+class _Task:
+    __slots__ = ("future", "fn", "args", "kwargs", "submitted")
+
+    def __init__(self, fn, args, kwargs):
+        self.future = Future()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+
+
+class QueryTasks:
+    """The tasks of one query on a FairExecutor, with the ThreadPoolExecutor interface."""
+
+    def __init__(self, executor, priority, limit):
+        self._executor = executor
+        self.priority = priority
+        self.limit = limit
+        self.queue = deque()   # tasks not started yet
+        self.running = 0
+        self.futures = []
+        self.closed = False
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor._submit(self, _Task(fn, args, kwargs))
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """
+        Stop accepting tasks. With `cancel_futures`, tasks not started yet are cancelled;
+        with `wait`, block until the others are done. Tasks already running are never
+        interrupted, the shared workers just finish them.
+        """
+        self._executor._close(self, cancel_futures)
+        if wait:
+            wait_futures(self.futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False
+
+
+class FairExecutor:
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, idle_timeout=IDLE_TIMEOUT, name="route-worker"):
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self._cond = threading.Condition()
+        self._ready = {}      # priority -> deque of queries with queued tasks, in turn order
+        self._threads = 0
+        self._idle = 0
+        self._busy = 0
+        self._queued = 0
+        self._sessions = 0
+        # Counters
+        self.completed = 0
+        self.cancelled = 0
+        self.queue_seconds = 0.0
+        self.peak_threads = 0
+        self.peak_queued = 0
+
+    def session(self, priority=0, limit=QUERY_WORKERS):
+        """Handle for the tasks of one query, see QueryTasks."""
+        with self._cond:
+            self._sessions += 1
+        return QueryTasks(self, priority, limit)
+
+    def _submit(self, session, task):
+        with self._cond:
+            if session.closed:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            session.queue.append(task)
+            session.futures.append(task.future)
+            if len(session.queue) == 1:
+                self._ready.setdefault(session.priority, deque()).append(session)
+            self._queued += 1
+            self.peak_queued = max(self.peak_queued, self._queued)
+            if self._idle < self._queued and self._threads < self.max_workers:
+                self._threads += 1
+                self.peak_threads = max(self.peak_threads, self._threads)
+                threading.Thread(target=self._work, name=f"{self.name}-{self._threads}", daemon=True).start()
+            else:
+                self._cond.notify()
+        return task.future
+
+    def _close(self, session, cancel_futures):
+        with self._cond:
+            if not session.closed:
+                session.closed = True
+                self._sessions -= 1
+            if not cancel_futures or not session.queue:
+                return
+            cancelled = list(session.queue)
+            session.queue.clear()
+            self._queued -= len(cancelled)
+            self.cancelled += len(cancelled)
+            ring = self._ready.get(session.priority)
+            if ring is not None and session in ring:
+                ring.remove(session)
+                if not ring:
+                    del self._ready[session.priority]
+        for task in cancelled:
+            # No worker will see these tasks: notify the waiters here or wait() never returns
+            task.future.cancel()
+            task.future.set_running_or_notify_cancel()
+
+    def _next_task(self):
+        """Next task by priority, then round-robin between queries under their limit. Holds the lock."""
+        for priority in sorted(self._ready):
+            ring = self._ready[priority]
+            for _ in range(len(ring)):
+                session = ring[0]
+                ring.rotate(-1)
+                if session.running >= session.limit:
+                    continue
+                task = session.queue.popleft()
+                if not session.queue:
+                    ring.remove(session)
+                    if not ring:
+                        del self._ready[priority]
+                session.running += 1
+                self._queued -= 1
+                return session, task
+        return None, None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                session, task = self._next_task()
+                while task is None:
+                    self._idle += 1
+                    notified = self._cond.wait(self.idle_timeout)
+                    self._idle -= 1
+                    session, task = self._next_task()
+                    if task is None and not notified:
+                        self._threads -= 1
+                        return
+                self._busy += 1
+
+            queued = time.perf_counter() - task.submitted
+            metrics.observe("route_executor_queue_seconds", queued, priority=session.priority)
+            if task.future.set_running_or_notify_cancel():
+                _local.queued = queued
+                try:
+                    task.future.set_result(task.fn(*task.args, **task.kwargs))
+                except BaseException as e:
+                    task.future.set_exception(e)
+                finally:
+                    _local.queued = None
+            task = None  # don't keep the result alive while idle
+
+            with self._cond:
+                self._busy -= 1
+                session.running -= 1
+                self.completed += 1
+                self.queue_seconds += queued
+                if self._queued and self._idle:
+                    self._cond.notify()  # a task held back by its query limit may be runnable now
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "threads": self._threads,
+                "busy": self._busy,
+                "queued": self._queued,
+                "queries": self._sessions,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "queue_seconds": round(self.queue_seconds, 6),
+                "peak_threads": self.peak_threads,
+                "peak_queued": self.peak_queued,
+            }
+
+
+route_executor = FairExecutor(max_workers=int(os.environ.get("ROUTE_WORKERS") or DEFAULT_WORKERS))
+
+metrics.add_collector(lambda: {f"route_executor_{name}": value for name, value in route_executor.stats().items()})
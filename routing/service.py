@@ -0,0 +1,326 @@
+"""
+Route finder as a long-running local HTTP service.
+
+    python -m routing.service --port 8700 --workers 4 --cache-db /tmp/route-cache.sqlite
+
+Endpoints (JSON in, JSON out):
+
+    POST /route     one query {"src_chain", "dst_chain", "src_token", "dst_token" (or "token"),
+                    "amount", "order", "deadline_ms", "speculative", "prune", "multi_route", "planner"}, returns the
+                    find_best_routes_parallel result. With ?stream=1 the response is JSON lines:
+                    the iter_best_routes events as strategies finish, the result last.
+    POST /batch     {"queries": [...], "deadline_ms"}, returns {"results": [{"result"} | {"error"}]}
+                    in input order. Batch queries yield to interactive ones upstream.
+    GET  /healthz   liveness
+    GET  /metrics   Prometheus metrics of the worker that answers
+
+The service owns the connection pool, the token registry and the quote cache, so
+every front end connected to it shares them. With --workers N, N processes accept
+connections on the same port (SO_REUSEPORT) and share quotes and multi-route results
+through the SQLite cache file; the upstream rate limit is split between them.
+
+--warm FILE and --warm-top N keep the listed and the N most queried routes warm
+(see routing/warmer.py). The warmer runs in the first worker and learns from the
+queries that worker serves. Add --multi-route when the front ends query in
+multi-route mode (the app's default) and --planner in planner mode, so the warmer
+refreshes the routes they read.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from routing import route_finder, tracing
+from routing.batch import DEFAULT_CONCURRENCY, _query_key, parse_query, read_queries, route_query
+
+
+DEFAULT_PORT = 8700
+MAX_BODY = 1 << 20    # bytes
+MAX_BATCH = 1000      # queries per /batch request
+
+
+########################################
+### ROUTING
+########################################
+
+def _deadline_ms(body):
+    deadline_ms = body.get("deadline_ms")
+    return None if deadline_ms is None else int(deadline_ms)
+
+
+def _route_kwargs(body):
+    query = parse_query(body)
+    return {
+        "src_chain_name": query["src_chain"],
+        "dst_chain_name": query["dst_chain"],
+        "src_token": query["src_token"],
+        "dst_token": query["dst_token"],
+        "amount": query["amount"],
+        "order": query["order"],
+        "speculative": bool(body.get("speculative", False)),
+        "prune": bool(body.get("prune", False)),
+        "multi_route": bool(body.get("multi_route", False)),
+        "planner": bool(body.get("planner", False)),
+        "deadline_ms": _deadline_ms(body),
+    }
+
+
+def route_batch(rows, deadline_ms=None, concurrency=DEFAULT_CONCURRENCY):
+    """Route the rows of a /batch request, identical queries once, results in input order."""
+    results = [None] * len(rows)
+    todo = {}  # query key -> (query, row numbers)
+    for i, row in enumerate(rows):
+        try:
+            query = parse_query(row)
+        except (KeyError, TypeError, ValueError) as e:
+            results[i] = {"error": f"Invalid query: {e}"}
+            continue
+        todo.setdefault(_query_key(query), (query, []))[1].append(i)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(route_query, query, deadline_ms): positions for query, positions in todo.values()}
+        for future, positions in futures.items():
+            try:
+                payload = {"result": future.result()}
+            except Exception as e:
+                payload = {"error": str(e)}
+            for i in positions:
+                results[i] = payload
+    return results
+
+
+########################################
+### HTTP
+########################################
+
+class RouteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, reuse_port=False, batch_concurrency=DEFAULT_CONCURRENCY):
+        self.allow_reuse_port = reuse_port
+        self.batch_concurrency = batch_concurrency
+        super().__init__(address, _Handler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/healthz":
+            self._reply(200, {"status": "ok", "pid": os.getpid()})
+        elif path == "/metrics":
+            self._reply_text(200, tracing.metrics.to_prometheus(), "text/plain; version=0.0.4")
+        else:
+            self._reply(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+
+        if url.path == "/route":
+            try:
+                kwargs = _route_kwargs(body)
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply(400, {"error": f"Invalid query: {e}"})
+                return
+            if parse_qs(url.query).get("stream") == ["1"]:
+                self._stream(route_finder.iter_best_routes(**kwargs))
+                return
+            try:
+                self._reply(200, route_finder.find_best_routes_parallel(**kwargs))
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+
+        elif url.path == "/batch":
+            rows = body.get("queries")
+            if not isinstance(rows, list) or len(rows) > MAX_BATCH:
+                self._reply(400, {"error": f"'queries' must be a list of at most {MAX_BATCH} queries"})
+                return
+            try:
+                deadline_ms = _deadline_ms(body)
+            except (TypeError, ValueError):
+                self._reply(400, {"error": "'deadline_ms' must be a number"})
+                return
+            results = route_batch(rows, deadline_ms, self.server.batch_concurrency)
+            self._reply(200, {"results": results})
+
+        else:
+            self._reply(404, {"error": f"Unknown path {url.path}"})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ValueError("Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def _stream(self, events):
+        """Send events as JSON lines, one chunk per event."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in events:
+                self._chunk(json.dumps(event, default=str).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            return  # the front end went away, stop routing
+        except Exception as e:
+            self._chunk(json.dumps({"done": True, "error": str(e)}).encode() + b"\n")
+        finally:
+            events.close()
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _reply(self, status, body):
+        self._reply_text(status, json.dumps(body, default=str), "application/json")
+
+    def _reply_text(self, status, text, content_type):
+        payload = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # one line per query is too much, see /metrics
+
+
+########################################
+### WORKERS
+########################################
+
+def setup_worker(cache_db=None, workers=1):
+    """Shared state of one service process: quote and routes cache backends, its share of the rate limit."""
+    if cache_db:
+        from routing.shared_cache import SqliteQuoteCache
+        route_finder.quote_cache = SqliteQuoteCache(cache_db)
+        route_finder.routes_cache = SqliteQuoteCache(
+            cache_db, table="routes", scale=route_finder.scale_routes, decode=route_finder.decode_routes
+        )
+    if workers > 1:
+        route_finder.rate_limiter = route_finder.AdaptiveRateLimiter(
+            rate=route_finder.RATE_LIMIT / workers,
+            burst=max(1, route_finder.RATE_LIMIT_BURST // workers),
+            concurrency=max(1, route_finder.CONCURRENCY_LIMIT // workers),
+            max_rate=route_finder.RATE_LIMIT_MAX / workers,
+        )
+
+
+def start_warmer(routes=(), top=0, multi_route=False, planner=False):
+    """Background cache warmer of the service, its counters are exported with the metrics."""
+    from routing.warmer import Warmer
+    warmer = Warmer(routes=routes, top=top, multi_route=multi_route, planner=planner).start()
+    tracing.metrics.add_collector(lambda: {f"route_warmer_{name}": value for name, value in warmer.stats().items()})
+    return warmer
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, cache_db=None, workers=1, batch_concurrency=DEFAULT_CONCURRENCY,
+          worker=0, warm_routes=(), warm_top=0, warm_multi_route=False, warm_planner=False):
+    """
+    Run one service process until interrupted. The first worker also runs the cache
+    warmer: the cache is shared, warming it from every worker would only repeat calls.
+    """
+    setup_worker(cache_db, workers)
+    server = RouteServer((host, port), reuse_port=workers > 1, batch_concurrency=batch_concurrency)
+    warmer = (
+        start_warmer(warm_routes, warm_top, warm_multi_route, warm_planner)
+        if worker == 0 and (warm_routes or warm_top) else None
+    )
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        if warmer is not None:
+            warmer.stop()
+        server.server_close()
+
+
+def run_workers(host, port, workers, **options):
+    """Start `workers` service processes on the same port (see serve) and restart the ones that die."""
+    def start(worker):
+        process = multiprocessing.Process(
+            target=serve, args=(host, port), kwargs=dict(options, workers=workers, worker=worker), daemon=True
+        )
+        process.start()
+        return process
+
+    processes = [start(worker) for worker in range(workers)]
+    try:
+        while True:
+            time.sleep(1)
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    print(f"Worker {process.pid} exited with {process.exitcode}, restarting", file=sys.stderr)
+                    processes[i] = start(i)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the route finder over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="service processes sharing the port")
+    parser.add_argument("--cache-db", help="SQLite file of the quote cache shared by the workers")
+    parser.add_argument("--batch-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="queries of a /batch request routed at the same time")
+    parser.add_argument("--warm", help="CSV or JSONL of routes to keep warm (routing.batch format)")
+    parser.add_argument("--warm-top", type=int, default=0, help="also keep the N most queried routes warm")
+    parser.add_argument("--multi-route", action="store_true",
+                        help="warm the routes of multi-route queries (the app's default mode)")
+    parser.add_argument("--planner", action="store_true", help="warm the routes of planner queries")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1 and not args.cache_db:
+        parser.error("--workers > 1 needs --cache-db to share quotes between workers")
+
+    options = {
+        "cache_db": args.cache_db,
+        "batch_concurrency": args.batch_concurrency,
+        "warm_routes": read_queries(args.warm) if args.warm else (),
+        "warm_top": args.warm_top,
+        "warm_multi_route": args.multi_route,
+        "warm_planner": args.planner,
+    }
+    print(f"Route service on http://{args.host}:{args.port} ({args.workers} worker(s))", file=sys.stderr)
+    if args.workers == 1:
+        serve(args.host, args.port, **options)
+    else:
+        run_workers(args.host, args.port, args.workers, **options)
+
+
+if __name__ == "__main__":
+    main()
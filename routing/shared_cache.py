@@ -0,0 +1,126 @@
+"""
+Quote cache shared by several processes through a SQLite file.
+
+    SqliteQuoteCache("/tmp/route-cache.sqlite")
+    SqliteQuoteCache("/tmp/route-cache.sqlite", table="routes", scale=scale_routes, decode=decode_routes)
+
+Each process keeps its in-memory QuoteCache in front of the file: a local miss
+is looked up in SQLite, and every quote put locally is also written there, so a
+quote fetched by one worker of the route service is served to the others.
+SQLite errors (locked database, full disk...) only cost the shared lookup, the
+local cache keeps working. Values are stored as JSON: `decode` turns what json.loads
+returns back into the cached value (tuples...) when it is not plain JSON.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import json
+import sqlite3
+import threading
+import time
+
+from routing.route_finder import QuoteCache
+
+
+PURGE_EVERY = 256  # puts between two deletions of expired rows
+
+
+########################################
+### CACHE
+########################################
+
+class SqliteQuoteCache(QuoteCache):
+
+    def __init__(self, path, table="quotes", decode=None, **kwargs):
+        super().__init__(**kwargs)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name '{table}'")
+        self.path = path
+        self.table = table
+        self.decode = decode
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self._local = threading.local()
+        self._puts = 0
+        with self._db() as db:
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY, expires_at REAL, amount REAL, quote TEXT)"
+            )
+
+    def _db(self):
+        """This thread's connection to the cache file."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _encode_key(key):
+        return json.dumps(list(key))
+
+    def get(self, key, amount):
+        quote = super().get(key, amount)
+        if quote is not None:
+            return quote
+
+        try:
+            row = self._db().execute(
+                f"SELECT expires_at, amount, quote FROM {self.table} WHERE key = ?", (self._encode_key(key),)
+            ).fetchone()
+        except sqlite3.Error:
+            self.shared_errors += 1
+            return None
+        if row is None:
+            return None
+        expires_at, cached_amount, encoded = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+
+        # Keep it in memory for the rest of its lifetime
+        cached = json.loads(encoded)
+        if self.decode is not None:
+            cached = self.decode(cached)
+        super().put(key, cached_amount, cached, ttl=remaining)
+        with self._lock:
+            self.misses -= 1
+            self.hits += 1
+            self.shared_hits += 1
+        return self.scale(cached, amount, cached_amount)
+
+    def put(self, key, amount, quote, ttl=None):
+        super().put(key, amount, quote, ttl)
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            db = self._db()
+            db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, expires_at, amount, quote) VALUES (?, ?, ?, ?)",
+                (self._encode_key(key), time.time() + ttl, amount, json.dumps(quote)),
+            )
+            with self._lock:
+                self._puts += 1
+                purge = self._puts % PURGE_EVERY == 0
+            if purge:
+                db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error:
+            self.shared_errors += 1
+
+    def clear(self):
+        super().clear()
+        try:
+            self._db().execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error:
+            self.shared_errors += 1
+
+    def stats(self):
+        stats = super().stats()
+        stats["shared_hits"] = self.shared_hits
+        stats["shared_errors"] = self.shared_errors
+        return stats
+
@@ -0,0 +1,257 @@
+"""
+Amount sweeps: how the efficiency of each strategy changes with the amount sent.
+
+    sweep = sweep_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", sample_amounts(0.1, 10), "CHEAPEST")
+    sweep["curves"]["direct"](2.5)   # efficiency (%) of the direct route for 2.5 WBTC
+
+Each sample amount is routed once, in parallel, with find_best_routes_parallel (or a
+RouteClient's, to sweep through the route service). The efficiencies of every strategy
+are interpolated between samples with a monotone cubic, so the curve never overshoots
+the sampled values. Curves are kept for CURVE_TTL
+seconds and answer estimate_routes() for amounts within the sampled range without
+calling the API.
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from routing.route_finder import (
+    LIFI_ROUTE_PREFIX,
+    QUOTE_CACHE_TTL,
+    find_best_routes_parallel,
+    get_efficiency,
+    submit_in_context,
+)
+
+
+SWEEP_POINTS = 5
+SWEEP_CONCURRENCY = 4     # sample amounts routed at the same time
+CURVE_TTL = QUOTE_CACHE_TTL
+
+
+########################################
+### INTERPOLATION
+########################################
+
+def sample_amounts(low, high, points=SWEEP_POINTS):
+    """`points` amounts spaced geometrically from `low` to `high`."""
+    if low <= 0 or high < low:
+        raise ValueError(f"Invalid sweep range {low} - {high}")
+    if points < 2 or low == high:
+        return [low]
+    ratio = (high / low) ** (1 / (points - 1))
+    return [low * ratio ** i for i in range(points - 1)] + [high]
+
+
+class QuoteCurve:
+    """
+    Efficiency (%) as a function of the amount, through sampled (amount, efficiency) points.
+    Interpolated on log(amount) with Fritsch-Carlson monotone cubic Hermite splines:
+    between two samples the curve stays within their efficiencies.
+    """
+
+    def __init__(self, points):
+        points = sorted(points)
+        if not points:
+            raise ValueError("A curve needs at least one point")
+        self.points = points
+        self.low = points[0][0]
+        self.high = points[-1][0]
+        self._x = [math.log(amount) for amount, _ in points]
+        self._y = [efficiency for _, efficiency in points]
+        self._slopes = self._tangents()
+
+    def _tangents(self):
+        x, y = self._x, self._y
+        n = len(x)
+        if n == 1:
+            return [0.0]
+        secants = [(y[i + 1] - y[i]) / (x[i + 1] - x[i]) for i in range(n - 1)]
+        slopes = [secants[0]] + [
+            0.0 if secants[i - 1] * secants[i] <= 0 else (secants[i - 1] + secants[i]) / 2
+            for i in range(1, n - 1)
+        ] + [secants[-1]]
+
+        # Limit the tangents so each interval stays monotone
+        for i, secant in enumerate(secants):
+            if secant == 0:
+                slopes[i] = slopes[i + 1] = 0.0
+                continue
+            alpha, beta = slopes[i] / secant, slopes[i + 1] / secant
+            norm = alpha * alpha + beta * beta
+            if norm > 9:
+                scale = 3 / math.sqrt(norm)
+                slopes[i] = scale * alpha * secant
+                slopes[i + 1] = scale * beta * secant
+        return slopes
+
+    def covers(self, amount):
+        return self.low <= amount <= self.high
+
+    def __call__(self, amount):
+        if not self.covers(amount):
+            raise ValueError(f"Amount {amount} outside of the sampled range {self.low} - {self.high}")
+        if len(self.points) == 1:
+            return self._y[0]
+
+        t = math.log(amount)
+        i = 0
+        while i < len(self._x) - 2 and t > self._x[i + 1]:
+            i += 1
+        x0, x1 = self._x[i], self._x[i + 1]
+        y0, y1 = self._y[i], self._y[i + 1]
+        h = x1 - x0
+        s = (t - x0) / h
+        h00 = (1 + 2 * s) * (1 - s) ** 2
+        h10 = s * (1 - s) ** 2
+        h01 = s * s * (3 - 2 * s)
+        h11 = s * s * (s - 1)
+        return h00 * y0 + h10 * h * self._slopes[i] + h01 * y1 + h11 * h * self._slopes[i + 1]
+
+
+########################################
+### CURVE CACHE
+########################################
+
+def _curve_key(src_chain_name, dst_chain_name, src_token, dst_token, order):
+    return (src_chain_name, dst_chain_name, src_token, dst_token, order)
+
+
+class CurveCache:
+    """Latest sweep curves per (chains, tokens, order), valid for `ttl` seconds."""
+
+    def __init__(self, ttl=CURVE_TTL):
+        self.ttl = ttl
+        self._entries = {}  # key -> (expires_at, {strategy: QuoteCurve})
+        self._lock = threading.Lock()
+
+    def put(self, key, curves):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, curves)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+curve_cache = CurveCache()
+
+
+########################################
+### FUNCTIONS
+########################################
+
+def curve_name(event):
+    """
+    Curve of an iter_best_routes event with a route. li.quest routes are named after their
+    tools ("li.quest via stargate → across"), their rank may change from one amount to the next.
+    """
+    if event["type"].startswith(LIFI_ROUTE_PREFIX):
+        return "li.quest via " + " → ".join(step.get("tool", "?") for step in event["route"]["steps"])
+    return event["type"]
+
+
+def strategy_efficiencies(events):
+    """
+    {curve: efficiency %} of the strategies that produced a route, from iter_best_routes
+    events (see curve_name). li.quest routes with the same tools keep the best one.
+    """
+    efficiencies = {}
+    for event in events:
+        if event.get("route"):
+            name = curve_name(event)
+            efficiencies[name] = max(efficiencies.get(name, -math.inf), get_efficiency(event["route"]))
+    return efficiencies
+
+
+def _route_amount(finder, src_chain_name, dst_chain_name, src_token, dst_token, amount, order, **options):
+    events = []
+    result = finder(src_chain_name, dst_chain_name, src_token, dst_token, amount, order,
+                    on_result=events.append, **options)
+    return result, strategy_efficiencies(events)
+
+
+def sweep_routes(src_chain_name, dst_chain_name, src_token, dst_token, amounts, order, fresh=False,
+                 speculative=False, deadline_ms=None, concurrency=SWEEP_CONCURRENCY, multi_route=False,
+                 planner=False, finder=None):
+    """
+    Route every amount of `amounts` in parallel and fit one QuoteCurve per strategy.
+    `multi_route` and `planner` select the routes as in find_best_routes_parallel; in
+    multi-route mode the curves follow li.quest's routes by their tools (see curve_name). `finder`
+    replaces find_best_routes_parallel, e.g. with RouteClient(...).find_best_routes_parallel
+    (which has no `fresh`).
+
+    Returns {"amounts": sorted amounts, "results": [find_best_routes_parallel result per amount],
+    "curves": {curve name: QuoteCurve}}. Amounts whose query failed are left out of the curves.
+    The curves are also kept in `curve_cache` for estimate_routes().
+    """
+    amounts = sorted(set(amounts))
+    options = {"speculative": speculative, "deadline_ms": deadline_ms, "multi_route": multi_route, "planner": planner}
+    if fresh:
+        options["fresh"] = True
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            submit_in_context(
+                executor, _route_amount, finder or find_best_routes_parallel,
+                src_chain_name, dst_chain_name, src_token, dst_token, amount, order, **options
+            )
+            for amount in amounts
+        ]
+
+    results = []
+    points = {}  # strategy -> [(amount, efficiency)]
+    for amount, future in zip(amounts, futures):
+        try:
+            result, efficiencies = future.result()
+        except Exception as e:
+            results.append({"error": str(e)})
+            continue
+        results.append(result)
+        for strategy, efficiency in efficiencies.items():
+            points.setdefault(strategy, []).append((amount, efficiency))
+
+    curves = {strategy: QuoteCurve(strategy_points) for strategy, strategy_points in points.items()}
+    if curves:
+        curve_cache.put(_curve_key(src_chain_name, dst_chain_name, src_token, dst_token, order), curves)
+    return {"amounts": amounts, "results": results, "curves": curves}
+
+
+def estimate_routes(src_chain_name, dst_chain_name, src_token, dst_token, amount, order):
+    """
+    {strategy: estimated efficiency %} at `amount` from the last sweep of this route,
+    without calling the API. None if there is no fresh sweep covering `amount`.
+    """
+    curves = curve_cache.get(_curve_key(src_chain_name, dst_chain_name, src_token, dst_token, order))
+    if not curves:
+        return None
+    estimates = {strategy: curve(amount) for strategy, curve in curves.items() if curve.covers(amount)}
+    return estimates or None
+
+
+def curve_series(curves, points=50):
+    """Dense {"amount": [...], strategy: [...]} series of `curves` for plotting (None outside a curve's range)."""
+    if not curves:
+        return {"amount": []}
+    low = min(curve.low for curve in curves.values())
+    high = max(curve.high for curve in curves.values())
+    grid = sample_amounts(low, high, points)
+    series = {"amount": grid}
+    for strategy, curve in curves.items():
+        series[strategy] = [curve(amount) if curve.covers(amount) else None for amount in grid]
+    return series
@@ -0,0 +1,377 @@
+"""
+Per-query tracing and aggregate metrics for the route finder.
+
+A trace is a tree of spans: one "query" span per find_best_routes_parallel call,
+with a "strategy" span per strategy outcome, a "hop" span per hop quote and an
+"http" span per li.quest request below it. Spans record their wall-clock start,
+duration, attributes (status code, chain pair...) and failure reason.
+
+Every finished span also feeds the metrics (counters and latency histograms),
+exported with `metrics.to_prometheus()` or `metrics.snapshot()`.
+
+Tracing is off unless ROUTE_TRACING=1 is set or `enable()` is called. When off,
+`tracer.span()` returns a shared no-op span and nothing is recorded, except in a
+`tracer.forced()` block (profiling of one query, see routing/profiling.py).
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import contextlib
+import contextvars
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+########################################
+### METRICS
+########################################
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms, keyed on a name and labels.
+    Collectors registered with add_collector() return {name: value} gauges
+    read at export time (cache sizes, rate limiter state...).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._collectors = []
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _gauges(self):
+        gauges = {}
+        for collector in self._collectors:
+            try:
+                gauges.update(collector())
+            except Exception:
+                continue  # a broken collector must not break the export
+        return gauges
+
+    def snapshot(self):
+        """JSON-serializable view of every metric."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+
+        def entry(name, labels, **values):
+            return {"name": name, "labels": dict(labels), **values}
+
+        return {
+            "counters": [entry(name, labels, value=value) for (name, labels), value in sorted(counters.items())],
+            "histograms": [
+                entry(
+                    name, labels,
+                    buckets=dict(zip([str(b) for b in self.buckets], values[:len(self.buckets)])),
+                    sum=values[-2], count=values[-1],
+                )
+                for (name, labels), values in sorted(histograms.items())
+            ],
+            "gauges": self._gauges(),
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), values in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {values[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+
+        for name, value in sorted(self._gauges().items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+########################################
+### SPANS
+########################################
+
+RECENT_TRACES = 100  # finished query traces kept in memory
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_forced = contextvars.ContextVar("tracing_forced", default=False)
+_ids = itertools.count(1)
+
+
+class Span:
+
+    recording = True
+
+    def __init__(self, tracer, name, parent=None, start=None, **attrs):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.span_id = next(_ids)
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.attrs = attrs
+        self.children = []
+        self.start = time.time() if start is None else start
+        self._started = time.perf_counter() - (time.time() - self.start)
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self._token = None
+        self._context = None
+        if parent is not None:
+            with tracer._lock:
+                parent.children.append(self)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, error):
+        self.status = "error"
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        self.tracer._finish(self)
+
+    def run(self, fn, *args, **kwargs):
+        """Call fn with this span as the current span, without leaving it current afterwards."""
+        if self._context is None:
+            self._context = contextvars.copy_context()
+            self._context.run(_current_span.set, self)
+        return self._context.run(fn, *args, **kwargs)
+
+    def iterate(self, iterable):
+        """
+        Iterate with this span current while each item is produced (see run). Returns
+        the value a generator returns, for `yield from`.
+        """
+        iterator = iter(iterable)
+        try:
+            while True:
+                try:
+                    item = self.run(next, iterator)
+                except StopIteration as stop:
+                    return stop.value
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                self.run(close)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.error is None:
+            self.fail(exc)
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def to_dict(self):
+        """The span and its children, start times in ms relative to the root span."""
+        origin = self.start
+
+        def convert(span):
+            return {
+                "name": span.name,
+                "span_id": span.span_id,
+                "start_ms": round((span.start - origin) * 1000, 3),
+                "duration_ms": None if span.duration is None else round(span.duration * 1000, 3),
+                "status": span.status,
+                "error": span.error,
+                "attrs": span.attrs,
+                "children": [convert(child) for child in list(span.children)],
+            }
+
+        return {"trace_id": self.trace_id, "start": self.start, **convert(self)}
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off."""
+
+    recording = False
+    trace_id = None
+
+    def set(self, **attrs):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def end(self):
+        pass
+
+    def run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def iterate(self, iterable):
+        return iterable
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def to_dict(self):
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Creates spans under the current one and turns finished spans into metrics.
+    Finished root spans are kept in `recent` and passed to every exporter.
+    """
+
+    def __init__(self, enabled=False, recent=RECENT_TRACES, metrics=metrics):
+        self.enabled = enabled
+        self.metrics = metrics
+        self.recent = deque(maxlen=recent)
+        self.exporters = []  # called with the to_dict() of every finished trace
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        """New span below the current one, to use as a context manager."""
+        if not self.enabled and not _forced.get():
+            return NOOP_SPAN
+        return Span(self, name, _current_span.get(), **attrs)
+
+    def record(self, name, start, status="ok", error=None, **attrs):
+        """Record an already finished span (started at wall-clock `start`) below the current one."""
+        if not self.enabled and not _forced.get():
+            return NOOP_SPAN
+        span = Span(self, name, _current_span.get(), start=start, **attrs)
+        if status != "ok":
+            span.fail(error or status)
+            span.status = status
+        span.end()
+        return span
+
+    def current(self):
+        return _current_span.get() or NOOP_SPAN
+
+    @contextlib.contextmanager
+    def forced(self):
+        """Record spans started in this context (and work submitted from it) even while tracing is off."""
+        token = _forced.set(True)
+        try:
+            yield
+        finally:
+            _forced.reset(token)
+
+    def _finish(self, span):
+        self.metrics.observe("route_span_seconds", span.duration, span=span.name)
+        self.metrics.inc("route_spans_total", span=span.name, status=span.status)
+        if span.parent is None:
+            trace = span.to_dict()
+            self.recent.append(trace)
+            for exporter in list(self.exporters):
+                exporter(trace)
+
+
+tracer = Tracer(enabled=os.environ.get("ROUTE_TRACING", "").lower() in ("1", "true", "yes"))
+
+
+def enable():
+    tracer.enabled = True
+
+
+def disable():
+    tracer.enabled = False
+
+
+class JsonLinesExporter:
+    """Trace exporter appending one JSON line per finished query trace to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, trace):
+        line = json.dumps(trace, default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+def snapshot():
+    """Metrics plus the recent traces, as one JSON-serializable dict."""
+    return {"metrics": metrics.snapshot(), "traces": list(tracer.recent)}
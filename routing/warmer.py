@@ -0,0 +1,198 @@
+"""
+Background cache warmer for popular routes.
+
+The warmer learns which (chains, tokens, amount bucket, order) are queried most
+from the recent interactive queries, and/or takes a configured list of routes. It
+re-routes them with fresh quotes before the quote cache expires, so interactive
+queries for those routes are served from the cache. Warming calls go through the
+shared rate limiter at the lowest priority and stay within `max_rate` requests per
+second on average.
+
+    warmer = Warmer(routes=read_queries("popular.csv"), top=20)
+    warmer.start()
+"""
+
+########################################
+### LIBRARY
+########################################
+
+import math
+import threading
+import time
+from collections import Counter, deque
+
+from routing import route_finder
+from routing.batch import warm_query_tokens
+from routing.route_finder import PRIORITY_WARM, find_best_routes_parallel, request_priority
+
+
+WARM_TOP = 10                                        # learned routes kept warm
+WARM_INTERVAL = route_finder.QUOTE_CACHE_TTL * 2 / 3  # seconds between two refreshes of a route
+WARM_RATE = 2.0                                       # average upstream requests per second
+QUERY_LOG_SIZE = 1000
+QUERY_LOG_WINDOW = 3600                               # seconds of queries the popularity is learned from
+AMOUNT_BUCKET_RATIO = 2.0                             # amounts within 2x of each other count as the same route
+
+
+########################################
+### QUERY LOG
+########################################
+
+def amount_bucket(amount):
+    if amount <= 0:
+        return None
+    return math.floor(math.log(amount, AMOUNT_BUCKET_RATIO))
+
+
+class QueryLog:
+    """
+    Recent interactive queries, registered as a route_finder query hook.
+    A route is (src_chain, dst_chain, src_token, dst_token, amount bucket, order);
+    it is warmed at the amount it was last queried with, since the quote cache
+    only serves amounts within 1% of the cached one.
+    """
+
+    def __init__(self, maxlen=QUERY_LOG_SIZE, window=QUERY_LOG_WINDOW):
+        self.window = window
+        self._entries = deque(maxlen=maxlen)  # (time, route key)
+        self._amounts = {}                    # route key -> last amount
+        self._lock = threading.Lock()
+
+    def record(self, src_chain, dst_chain, src_token, dst_token, amount, order):
+        key = (src_chain, dst_chain, src_token, dst_token, amount_bucket(amount), order)
+        with self._lock:
+            self._entries.append((time.monotonic(), key))
+            self._amounts[key] = amount
+
+    def top(self, n):
+        """The `n` most queried routes of the window, as query dicts (routing.batch format)."""
+        since = time.monotonic() - self.window
+        with self._lock:
+            counts = Counter(key for at, key in self._entries if at >= since)
+            amounts = dict(self._amounts)
+        return [
+            {
+                "src_chain": key[0], "dst_chain": key[1], "src_token": key[2], "dst_token": key[3],
+                "amount": amounts[key], "order": key[5],
+            }
+            for key, _ in counts.most_common(n)
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._amounts.clear()
+
+
+query_log = QueryLog()
+
+
+########################################
+### WARMER
+########################################
+
+def _route_key(query):
+    return tuple(query[field] for field in ("src_chain", "dst_chain", "src_token", "dst_token", "amount", "order"))
+
+
+class Warmer:
+    """
+    Keeps `routes` (configured query dicts) plus the `top` most queried routes warm,
+    refreshing each one every `interval` seconds at most `max_rate` upstream requests
+    per second. When the budget does not cover every route in one interval, the
+    configured routes come first, then the learned ones by popularity. Set
+    `multi_route` and `planner` as the front end queries.
+    """
+
+    def __init__(self, routes=(), top=WARM_TOP, interval=WARM_INTERVAL, max_rate=WARM_RATE, log=query_log,
+                 multi_route=False, planner=False):
+        self.routes = list(routes)
+        self.top = top
+        self.interval = interval
+        self.max_rate = max_rate
+        self.log = log
+        self.multi_route = multi_route
+        self.planner = planner
+        self.cycles = 0
+        self.warmed = 0
+        self.skipped = 0   # routes left out of a cycle by the budget
+        self.failed = 0
+        self.calls = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def targets(self):
+        targets = {}
+        for query in self.routes + (self.log.top(self.top) if self.top else []):
+            targets.setdefault(_route_key(query), query)
+        return list(targets.values())
+
+    def warm_once(self):
+        """Refresh the targets once, within the interval and the request budget. Returns the routes warmed."""
+        targets = self.targets()
+        cycle_end = time.monotonic() + self.interval
+        warmed = 0
+
+        priority = request_priority.set(PRIORITY_WARM)
+        try:
+            warm_query_tokens(targets)
+            for i, query in enumerate(targets):
+                if self._stop.is_set() or time.monotonic() >= cycle_end:
+                    self.skipped += len(targets) - i
+                    break
+                try:
+                    result = find_best_routes_parallel(
+                        query["src_chain"], query["dst_chain"], query["src_token"], query["dst_token"],
+                        query["amount"], query["order"], fresh=True, multi_route=self.multi_route,
+                        planner=self.planner
+                    )
+                    stats = result.get("stats", {})
+                    calls = stats.get("hops_quoted", 0) + stats.get("planner_quotes", 0) + (1 if self.multi_route else 0)
+                    warmed += 1
+                except Exception:
+                    calls = 1
+                    self.failed += 1
+                self.calls += calls
+                # Pace the cycle so warming averages at most max_rate requests per second
+                if self._stop.wait(calls / self.max_rate):
+                    break
+        finally:
+            request_priority.reset(priority)
+
+        self.cycles += 1
+        self.warmed += warmed
+        return warmed
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.warm_once()
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        """Start learning from interactive queries and warming in a background thread."""
+        if self._thread is not None:
+            return self
+        if self.top and self.log.record not in route_finder.query_hooks:
+            route_finder.query_hooks.append(self.log.record)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.log.record in route_finder.query_hooks:
+            route_finder.query_hooks.remove(self.log.record)
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        return {
+            "cycles": self.cycles,
+            "warmed": self.warmed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "calls": self.calls,
+        }
@@ -1,10 +1,127 @@
 import streamlit as st
+import contextlib
+import json
 import math
+import os
+from routing.client import RouteClient
+from routing.config import configure
+from routing.profiling import PROFILE_MODES, QueryProfiler, timeline, timeline_spec
 from routing.route_finder import find_best_routes_parallel
+from routing.sweep import SWEEP_POINTS, curve_series, estimate_routes, sample_amounts, sweep_routes
+from routing.warmer import Warmer
 
 # Allowed chains
 CHAIN_OPTIONS = ["Gnosis","Ethereum", "Solana","Abstract", "Unichain", "Sei", "Sui", "Base", "Arbitrum", "Polygon", "Berachain", "Optimism", "Lisk", "Taiko", "Rootstock", "Sonic", "Soneium", "Bitcoin", "Avalanche", "BSC", "HyperEVM", "Corn", "Ink","Superposition"]
 
+# Latency budget of a query: slower strategies are reported as timed out
+ROUTE_DEADLINE_MS = 8000
+
+# Ask li.quest for its candidate routes in one call, the hand-built strategies are the
+# fallback when it has none (set ROUTE_MULTI=0 to always run the strategies)
+MULTI_ROUTE = os.environ.get("ROUTE_MULTI", "1") != "0"
+
+# Routes the best route is compared with: the direct quote, or in multi-route mode
+# li.quest's first route (what /v1/quote would have answered)
+BASELINE_ROUTES = {"direct": "Direct Route", "lifi_route_1": "li.quest's First Route"}
+
+# Search routes through the hub assets of routing/route_planner.py instead of the
+# hand-built strategies (ROUTE_PLANNER=1)
+PLANNER = os.environ.get("ROUTE_PLANNER") == "1"
+
+# Debug panel to profile a query, shown with ?debug=1 in the URL or ROUTE_DEBUG=1
+DEBUG_PANEL = os.environ.get("ROUTE_DEBUG") == "1" or st.query_params.get("debug") == "1"
+
+# The routing core reads LIFI_API_KEY from the environment, the app falls back to its secret
+if not os.environ.get("LIFI_API_KEY"):
+    try:
+        configure(api_key=st.secrets["auth_token"])
+    except (FileNotFoundError, KeyError):
+        pass  # anonymous li.quest calls, with a lower rate limit
+
+# With a route service (python -m routing.service), routes come from it and its shared caches
+ROUTE_SERVICE_URL = os.environ.get("ROUTE_SERVICE_URL")
+if ROUTE_SERVICE_URL:
+    find_best_routes_parallel = RouteClient(ROUTE_SERVICE_URL).find_best_routes_parallel
+
+
+@st.cache_resource
+def start_cache_warmer(top):
+    """One warmer per app process, shared by every session."""
+    return Warmer(top=top, multi_route=MULTI_ROUTE, planner=PLANNER).start()
+
+
+# Keep the ROUTE_WARM_TOP most queried routes warm (the route service has its own warmer)
+if not ROUTE_SERVICE_URL and os.environ.get("ROUTE_WARM_TOP"):
+    start_cache_warmer(int(os.environ["ROUTE_WARM_TOP"]))
+
+
+def find_baseline(routes):
+    """The route of `routes` the best one is compared with, see BASELINE_ROUTES."""
+    return next((route for route in routes if route and route.get("type") in BASELINE_ROUTES and route.get("steps")), None)
+
+
+def render_best_route(best, baseline, dst_token):
+    st.subheader("✅ Best Route")
+    st.write(f"**Type**: {best['type']}")
+    st.write(f"**Description**: {best['description']}")
+
+    # Calculate total time and efficiency
+    total_best_time = sum(step.get("time", 0) for step in best["steps"])
+    efficiencies = [step.get("efficiency") for step in best["steps"] if "efficiency" in step]
+    total_efficiency = math.prod(efficiencies) if efficiencies else None
+
+    if total_efficiency is not None:
+        st.write(f"**Total Efficiency**: {total_efficiency:.2%}")
+    else:
+        st.write("**Total Efficiency**: N/A")
+
+    st.write(f"**Total Estimated Time**: {total_best_time:.2f} seconds")
+
+    # Compare with the direct route (li.quest's first route in multi-route mode) if available
+    if baseline and best["type"] != baseline["type"]:
+        baseline_name = BASELINE_ROUTES[baseline["type"]]
+        best_final_amount = best["steps"][-1].get("expectedAmount")
+        direct_final_amount = baseline["steps"][-1].get("expectedAmount")
+
+        # Extract token symbol
+        token_symbol = dst_token.get("symbol") if isinstance(dst_token, dict) else dst_token
+
+        try:
+            best_amt = float(best_final_amount)
+            direct_amt = float(direct_final_amount)
+
+            absolute_improvement = best_amt - direct_amt
+            relative_improvement = (absolute_improvement / direct_amt) if direct_amt != 0 else 0
+
+            st.write(f"**Improvement over {baseline_name}**:")
+            st.write(f"- Absolute: {absolute_improvement:,.4f} {token_symbol}")
+            st.write(f"- Relative: {relative_improvement:.2%}")
+        except Exception as e:
+            st.warning(f"Could not compute improvement vs. {baseline_name}: {e}")
+
+    # Show steps
+    for i, step in enumerate(best["steps"], 1):
+        with st.expander(f"Step {i} - {step.get('tool', 'N/A')}"):
+            st.write(f"**Expected Amount**: {step.get('expectedAmount')}")
+            st.write(f"**Efficiency**: {step.get('efficiency'):.4%}")
+            st.write(f"**Execution Time**: {step.get('time')} seconds")
+            st.write(f"**Jumper Link**: {step.get('link')}")
+
+
+def render_debug_panel(profiler, result):
+    with st.expander("🐞 Query profile", expanded=True):
+        st.write(f"**Wall time**: {profiler.duration:.2f} seconds")
+        rows = timeline(result.get("trace") if result else None)
+        if rows:
+            st.vega_lite_chart(spec=timeline_spec(rows))
+        else:
+            st.caption("No timeline: the query was not traced (route service without tracing?).")
+        st.code(profiler.report(), language="text")
+        st.download_button("Download profile", profiler.dump(), file_name=profiler.filename)
+        if rows:
+            st.download_button("Download timeline", json.dumps(rows), file_name="route-query-timeline.json")
+
+
 st.title("Jumper Route Finder")
 
 # Inputs 
@@ -27,9 +144,43 @@ route_preference = st.radio(
     horizontal=True
 )
 
+# Amounts within the range of a recent sweep are estimated right away, from its curves
+estimates = estimate_routes(src_chain, dst_chain, src_token, dst_token, amount, route_preference) if amount > 0 else None
+if estimates:
+    st.caption("Estimated from the last amount sweep: " + ", ".join(
+        f"{route_type} {efficiency:.2f}%" for route_type, efficiency in sorted(estimates.items(), key=lambda e: -e[1])
+    ))
+
+profile_mode = None
+if DEBUG_PANEL:
+    with st.expander("🐞 Debug"):
+        if st.checkbox("Profile the next query"):
+            profile_mode = st.radio("Profiler", PROFILE_MODES, horizontal=True,
+                                    help="cprofile: this session's thread, sampling: every thread")
+
 if st.button("Compute Best Route"):
 
-    with st.spinner("Finding best route..."):
+    # Filled in place as strategies finish, fastest first
+    progress_panel = st.empty()
+    best_panel = st.empty()
+    finished = {}
+
+    def show_progress(event):
+        finished[event["type"]] = event
+        with progress_panel.container():
+            for route_type, update in finished.items():
+                if update["route"]:
+                    st.write(f"✔️ {route_type}: {update['route']['cumulativeEfficiency']}")
+                else:
+                    st.write(f"✖️ {route_type}: {update['status']}")
+        if event["best"]:
+            baseline = find_baseline(update["route"] for update in finished.values())
+            with best_panel.container():
+                render_best_route(event["best"], baseline, dst_token)
+
+    result = None
+    profiler = QueryProfiler(profile_mode) if profile_mode else contextlib.nullcontext()
+    with st.spinner("Finding best route..."), profiler:
 
         try:
             result = find_best_routes_parallel(
@@ -38,61 +189,21 @@ if st.button("Compute Best Route"):
                 src_token=src_token,
                 dst_token=dst_token,
                 amount=amount,
-                order=route_preference
+                order=route_preference,
+                deadline_ms=ROUTE_DEADLINE_MS,
+                on_result=show_progress,
+                multi_route=MULTI_ROUTE,
+                planner=PLANNER
             )
 
             best = result.get("best")
             alternatives = result.get("alternatives", [])
 
             if not best:
-                st.error("No valid route found.")
+                best_panel.error("No valid route found.")
             else:
-                st.subheader("✅ Best Route")
-                st.write(f"**Type**: {best['type']}")
-                st.write(f"**Description**: {best['description']}")
-
-                # Calculate total time and efficiency
-                total_best_time = sum(step.get("time", 0) for step in best["steps"])
-                efficiencies = [step.get("efficiency") for step in best["steps"] if "efficiency" in step]
-                total_efficiency = math.prod(efficiencies) if efficiencies else None
-
-                if total_efficiency is not None:
-                    st.write(f"**Total Efficiency**: {total_efficiency:.2%}")
-                else:
-                    st.write("**Total Efficiency**: N/A")
-
-                st.write(f"**Total Estimated Time**: {total_best_time:.2f} seconds")
-
-                # Compare with direct route if available
-                if best["type"] != "direct":
-                    direct_route = next((alt for alt in alternatives if alt.get("type") == "direct"), None)
-                    if direct_route:
-                        best_final_amount = best["steps"][-1].get("expectedAmount")
-                        direct_final_amount = direct_route["steps"][-1].get("expectedAmount")
-
-                        # Extract token symbol
-                        token_symbol = dst_token.get("symbol") if isinstance(dst_token, dict) else dst_token
-
-                        try:
-                            best_amt = float(best_final_amount)
-                            direct_amt = float(direct_final_amount)
-
-                            absolute_improvement = best_amt - direct_amt
-                            relative_improvement = (absolute_improvement / direct_amt) if direct_amt != 0 else 0
-
-                            st.write(f"**Improvement over Direct Route**:")
-                            st.write(f"- Absolute: {absolute_improvement:,.4f} {token_symbol}")
-                            st.write(f"- Relative: {relative_improvement:.2%}")
-                        except Exception as e:
-                            st.warning(f"Could not compute improvement vs. direct route: {e}")
-
-                # Show steps
-                for i, step in enumerate(best["steps"], 1):
-                    with st.expander(f"Step {i} - {step.get('tool', 'N/A')}"):
-                        st.write(f"**Expected Amount**: {step.get('expectedAmount')}")
-                        st.write(f"**Efficiency**: {step.get('efficiency'):.4%}")
-                        st.write(f"**Execution Time**: {step.get('time')} seconds")
-                        st.write(f"**Jumper Link**: {step.get('link')}")
+                with best_panel.container():
+                    render_best_route(best, find_baseline(alternatives), dst_token)
 
                 # Show alternatives
                 if alternatives:
@@ -101,9 +212,47 @@ if st.button("Compute Best Route"):
                         alt_time = sum(step.get("time", 0) for step in alt["steps"])
                         with st.expander(f"{alt['type']} - Efficiency: {alt['efficiency']}"):
                             st.write(alt["description"])
+                            if alt.get("status") == "timed_out":
+                                st.write(f"Did not finish within {ROUTE_DEADLINE_MS / 1000:.1f} seconds.")
+                            elif alt.get("status") == "skipped":
+                                st.write("Not tried: one of its chains keeps failing, it is retried shortly.")
                             st.write(f"**Total Estimated Time**: {alt_time:.2f} seconds")
                             for j, step in enumerate(alt["steps"], 1):
                                 st.write(f"- Step {j}: {step.get('tool', 'N/A')}, Expected: {step.get('expectedAmount')}, Efficiency: {step.get('efficiency'):.4%}, Time: {step.get('time')}s, Jumper Link: {step.get('link')}")
 
         except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+            st.error(f"An error occurred: {str(e)}")
+
+    if profile_mode:
+        render_debug_panel(profiler, result)
+
+
+# Efficiency of every strategy across a range of amounts
+with st.expander("📈 Efficiency vs Amount"):
+    sweep_col1, sweep_col2, sweep_col3 = st.columns(3)
+    with sweep_col1:
+        sweep_low = st.number_input("From", min_value=0.0, step=0.1, value=max(amount / 10, 0.01))
+    with sweep_col2:
+        sweep_high = st.number_input("To", min_value=0.0, step=0.1, value=max(amount * 10, 0.1))
+    with sweep_col3:
+        sweep_points = st.number_input("Sampled amounts", min_value=2, max_value=10, value=SWEEP_POINTS)
+
+    if st.button("Sweep Amounts"):
+        with st.spinner("Sampling amounts..."):
+            try:
+                sweep = sweep_routes(
+                    src_chain, dst_chain, src_token, dst_token,
+                    sample_amounts(sweep_low, sweep_high, int(sweep_points)),
+                    route_preference, deadline_ms=ROUTE_DEADLINE_MS, multi_route=MULTI_ROUTE, planner=PLANNER,
+                    finder=find_best_routes_parallel
+                )
+                if not sweep["curves"]:
+                    st.error("No route found for any of the sampled amounts.")
+                else:
+                    st.line_chart(curve_series(sweep["curves"]), x="amount")
+                    st.caption(
+                        "Sampled at " + ", ".join(f"{a:g}" for a in sweep["amounts"]) +
+                        f" {src_token}, interpolated in between. Amounts in this range are estimated without new quotes."
+                    )
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
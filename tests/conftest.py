@@ -0,0 +1,75 @@
+"""
+Shared fixtures: a fake quote_hop for the route finder and the planner, the local mock
+li.quest server (benchmarks/mock_server.py) serving the synthetic fixture, and a route
+finder reset between tests.
+"""
+
+import threading
+import time
+
+import pytest
+
+from benchmarks.fixtures import synthetic_fixture
+from benchmarks.mock_server import ErrorModel, LatencyModel, MockLifiServer
+from benchmarks.run import reset_state, warm_tokens
+from routing import route_finder, route_planner
+from routing.config import configure
+
+
+class FakeHops:
+    """
+    quote_hop without HTTP: a hop keeps `efficiency` of the value, or its entry of
+    `efficiencies` keyed on (src_chain, src_token, dst_chain, dst_token) (None: the hop
+    fails), after `delay` seconds. Every call is recorded in `calls`.
+    """
+
+    def __init__(self):
+        self.efficiency = 0.9
+        self.efficiencies = {}
+        self.delay = 0
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def quote_hop(self, src_chain, dst_chain, src_token, dst_token, amount, order, fresh=False):
+        hop = (src_chain, src_token, dst_chain, dst_token)
+        with self._lock:
+            self.calls.append(hop)
+        time.sleep(self.delay)
+        efficiency = self.efficiencies.get(hop, self.efficiency)
+        if efficiency is None:
+            raise ValueError(f"No quote from {src_chain} to {dst_chain}")
+        quote = {"tool": "fake", "expectedAmount": amount * efficiency, "efficiency": efficiency, "time": 30}
+        return quote, {"price_from_amount": 1.0, "price_to_amount": 1.0}
+
+
+@pytest.fixture
+def hops(monkeypatch):
+    fake = FakeHops()
+    monkeypatch.setattr(route_finder, "quote_hop", fake.quote_hop)
+    monkeypatch.setattr(route_planner, "quote_hop", fake.quote_hop)
+    return fake
+
+
+@pytest.fixture(scope="session")
+def lifi_server():
+    server = MockLifiServer(synthetic_fixture()).start()
+    configure(base_url=server.url)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def lifi(lifi_server, monkeypatch):
+    """The mock server without latency or errors, caches and breakers of the route finder cleared."""
+    lifi_server.latency = LatencyModel()
+    lifi_server.errors = ErrorModel()
+    # The production limiter starts at 10 requests per second, too slow for timing assertions
+    monkeypatch.setattr(route_finder, "rate_limiter", route_finder.AdaptiveRateLimiter(rate=1000, burst=1000, concurrency=64))
+    monkeypatch.setattr(route_finder, "RETRY_BACKOFF", 0.001)
+    reset_state(route_finder)
+    warm_tokens(route_finder, [("Ethereum", "Arbitrum", "WBTC", 1)])
+    lifi_server.reset_counts()
+    yield lifi_server
+    lifi_server.latency = LatencyModel()
+    lifi_server.errors = ErrorModel()
+    reset_state(route_finder)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from routing import async_engine, route_finder
+from routing.async_engine import find_best_routes, find_best_routes_sync
+from routing.route_finder import find_best_routes_parallel
+
+
+def test_same_result_as_the_thread_engine(hops):
+    hops.efficiencies = {("Ethereum", "WBTC", "Base", "ETH"): 0.99, ("Base", "ETH", "Arbitrum", "WBTC"): 0.99}
+    expected = find_best_routes_parallel("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+    result = find_best_routes_sync("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+
+    assert result["best"] == expected["best"]
+    assert result["best"]["type"] == "via_base_direct"
+    assert sorted(result["alternatives"], key=str) == sorted(expected["alternatives"], key=str)
+    assert result["stats"] == expected["stats"]
+
+
+def test_one_loop_runs_many_queries_at_once(hops):
+    hops.delay = 0.05
+
+    async def route_all():
+        return await asyncio.gather(*(
+            find_best_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1 + i / 100, "CHEAPEST") for i in range(8)
+        ))
+
+    started = time.perf_counter()
+    results = asyncio.run(route_all())
+
+    # 4 hops in a row at 50 ms each, the 8 queries overlap instead of running one after the other
+    assert time.perf_counter() - started < 8 * 0.2
+    assert {result["best"]["type"] for result in results} == {"direct"}
+
+
+def test_deadline_and_progress_events(hops):
+    hops.delay = 0.15
+    events = []
+    started = time.perf_counter()
+    result = find_best_routes_sync("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", deadline_ms=250,
+                                   on_result=events.append)
+
+    assert time.perf_counter() - started < 0.4
+    assert result["best"]["type"] == "direct"
+    assert events[0]["type"] == "direct"
+    assert "timed_out" in {alternative.get("status") for alternative in result["alternatives"]}
+
+
+def test_single_calls_delegate_to_the_route_finder(monkeypatch):
+    monkeypatch.setattr(route_finder, "resolve_token", lambda chain_id, token: ("0x" + "1" * 40, 8, "60000"))
+    assert asyncio.run(async_engine.resolve_token(1, "WBTC")) == ("0x" + "1" * 40, 8, "60000")
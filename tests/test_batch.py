@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from routing import batch
+from routing.batch import parse_query, read_checkpoint, read_queries, run_batch
+
+
+QUERY = {"src_chain": "Ethereum", "dst_chain": "Arbitrum", "src_token": "WBTC", "dst_token": "WBTC",
+         "amount": 1.0, "order": "CHEAPEST"}
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """route_query answering {"amount": ...} without the network, recording the routed amounts."""
+    amounts = []
+
+    def route_query(query, deadline_ms=None):
+        amounts.append(query["amount"])
+        if query["amount"] < 0:
+            raise ValueError("Invalid amount")
+        return {"amount": query["amount"]}
+
+    monkeypatch.setattr(batch, "route_query", route_query)
+    monkeypatch.setattr(batch.token_registry, "resolve_many", lambda queries, return_exceptions=False: [])
+    return amounts
+
+
+def test_parse_query_shared_token_and_default_order(tmp_path):
+    path = tmp_path / "queries.csv"
+    path.write_text("src_chain,dst_chain,token,amount\nEthereum,Arbitrum,WBTC,1.5\n")
+    assert read_queries(str(path)) == [{**QUERY, "amount": 1.5}]
+    with pytest.raises(KeyError):
+        parse_query({"src_chain": "Ethereum", "dst_chain": "Arbitrum", "amount": "1"})
+
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_bytes(b'{"row": 0, "result": {}}\n{"row": 1, "result": {}}\n{"row": 2, "res')
+
+    assert read_checkpoint(str(path)) == {0, 1}
+    assert path.read_bytes() == b'{"row": 0, "result": {}}\n{"row": 1, "result": {}}\n'
+    assert read_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_resume_routes_only_the_missing_rows(tmp_path, routed):
+    queries = [{**QUERY, "amount": float(amount)} for amount in (1, 2, 3, -1)]
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps({"row": 0, "query": queries[0], "result": {"amount": 1.0}}) + '\n{"row": 1, "qu')
+
+    assert run_batch(queries, str(path)) == 3
+    assert sorted(routed) == [-1.0, 2.0, 3.0]
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert sorted(line["row"] for line in lines) == [0, 1, 2, 3]
+    assert next(line for line in lines if line["row"] == 3)["error"] == "Invalid amount"
+
+    # Everything is written: a rerun has nothing left to do
+    assert run_batch(queries, str(path)) == 0
+
+
+def test_identical_queries_are_routed_once(tmp_path, routed):
+    assert run_batch([QUERY, dict(QUERY), {**QUERY, "amount": 2.0}], str(tmp_path / "results.jsonl")) == 3
+    assert sorted(routed) == [1.0, 2.0]
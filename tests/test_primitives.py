@@ -0,0 +1,237 @@
+import threading
+import time
+
+import pytest
+
+from routing.route_finder import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_WARM,
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    FailureCache,
+    SingleFlight,
+)
+
+
+def _wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+########################################
+### SINGLE FLIGHT
+########################################
+
+def _follow(flight, key, fn, outcomes):
+    try:
+        outcomes.append(flight.do(key, fn))
+    except Exception as e:
+        outcomes.append(e)
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return {"tool": "synthetic"}
+
+    outcomes = []
+    threads = [threading.Thread(target=_follow, args=(flight, "quote", fetch, outcomes)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: flight.shared == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert outcomes == [{"tool": "synthetic"}] * 5
+
+
+def test_single_flight_followers_get_the_leader_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        raise ValueError("HTTP 503")
+
+    outcomes = []
+    threads = [threading.Thread(target=_follow, args=(flight, "quote", fetch, outcomes)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: flight.shared == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(outcomes) == 3
+    assert all(isinstance(outcome, ValueError) and str(outcome) == "HTTP 503" for outcome in outcomes)
+
+    # The failed call is forgotten, the next caller tries again
+    assert flight.do("quote", lambda: "retried") == "retried"
+
+
+########################################
+### CIRCUIT BREAKER
+########################################
+
+def test_breaker_trips_after_consecutive_failures_only():
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    pair = (1, 42161)
+    breaker.failure(pair)
+    breaker.failure(pair)
+    breaker.success(pair)
+    breaker.failure(pair)
+    breaker.failure(pair)
+    assert not breaker.is_open(pair)
+
+    breaker.failure(pair)
+    assert breaker.is_open(pair)
+    assert not breaker.allow(pair)
+    assert breaker.allow((1, 10))
+    assert breaker.stats() == {"open": 1, "trips": 1}
+
+
+def test_breaker_half_open_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05, cooldown_max=0.15)
+    pair = (1, 42161)
+    breaker.failure(pair)
+    assert not breaker.allow(pair)
+
+    time.sleep(0.06)
+    assert not breaker.is_open(pair)
+    assert breaker.allow(pair)          # the probe
+    assert not breaker.allow(pair)      # only one probe at a time
+    assert breaker.is_open(pair)
+
+    # A failed probe opens the pair again, for twice as long
+    breaker.failure(pair)
+    time.sleep(0.06)
+    assert not breaker.allow(pair)
+    time.sleep(0.06)
+    assert breaker.allow(pair)
+
+    # A successful probe closes it
+    breaker.success(pair)
+    assert breaker.allow(pair)
+    assert breaker.allow(pair)
+    assert breaker.stats()["open"] == 0
+
+
+def test_breaker_cooldown_is_capped():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.02, cooldown_max=0.04)
+    pair = (1, 42161)
+    breaker.failure(pair)
+    for _ in range(3):
+        time.sleep(0.05)
+        assert breaker.allow(pair)
+        breaker.failure(pair)
+    time.sleep(0.05)
+    assert breaker.allow(pair)
+
+
+def test_breaker_answered_probe_closes_but_does_not_reset_failures():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.02)
+    pair = (1, 42161)
+    breaker.failure(pair)
+    breaker.answered(pair)
+    breaker.failure(pair)
+    assert breaker.is_open(pair)
+
+    time.sleep(0.03)
+    assert breaker.allow(pair)
+    breaker.answered(pair)
+    assert not breaker.is_open(pair)
+    assert breaker.allow(pair)
+
+
+def test_failure_cache_expires():
+    cache = FailureCache(maxsize=2, ttl=0.05)
+    cache.put("a", "HTTP 404")
+    assert cache.get("a") == "HTTP 404"
+    cache.put("b", "HTTP 404")
+    cache.put("c", "HTTP 404")
+    assert cache.get("a") is None   # evicted
+    time.sleep(0.06)
+    assert cache.get("c") is None   # expired
+    assert cache.stats()["hits"] == 1
+
+
+########################################
+### RATE LIMITER
+########################################
+
+def test_limiter_serves_waiting_calls_by_priority():
+    limiter = AdaptiveRateLimiter(rate=1000, burst=1000, concurrency=1)
+    limiter.acquire()
+    order = []
+
+    def call(priority, name):
+        limiter.acquire(priority)
+        order.append(name)
+        limiter.release(200)
+
+    threads = []
+    for priority, name in ((PRIORITY_WARM, "warm"), (PRIORITY_BATCH, "batch"), (PRIORITY_INTERACTIVE, "interactive")):
+        thread = threading.Thread(target=call, args=(priority, name))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: limiter.stats()["queue_depth"] == len(threads))
+    limiter.release(200)
+    for thread in threads:
+        thread.join()
+
+    assert order == ["interactive", "batch", "warm"]
+
+
+def test_limiter_backs_off_on_429():
+    limiter = AdaptiveRateLimiter(rate=10, burst=10, concurrency=4)
+    limiter.acquire()
+    limiter.release(429, retry_after=0.05)
+    stats = limiter.stats()
+    assert stats["rate"] == 5
+    assert stats["concurrency_limit"] == 2
+    assert stats["throttled"] == 1
+    assert stats["paused_for"] > 0
+
+
+def test_limiter_never_passes_max_rate():
+    limiter = AdaptiveRateLimiter(rate=10, burst=1000, concurrency=4, max_rate=12)
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(200)
+    assert limiter.stats()["rate"] == 12
+
+
+def test_limiter_bounds_requests_in_flight():
+    limiter = AdaptiveRateLimiter(rate=1000, burst=1000, concurrency=2)
+    limiter.acquire()
+    limiter.acquire()
+    third = threading.Thread(target=limiter.acquire)
+    third.start()
+    time.sleep(0.05)
+    assert third.is_alive()
+    limiter.release(None)   # no response: the limits stay as they are
+    third.join(timeout=2)
+    assert not third.is_alive()
+    assert limiter.stats()["in_flight"] == 2
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_limiter_ignores_server_errors(status):
+    limiter = AdaptiveRateLimiter(rate=10, burst=10, concurrency=4)
+    limiter.acquire()
+    limiter.release(status)
+    assert limiter.stats()["rate"] == 10
@@ -0,0 +1,54 @@
+import pytest
+
+from routing.profiling import QueryProfiler, timeline
+from routing.route_finder import find_best_routes_parallel
+
+
+def _span(name, start_ms, duration_ms, children=(), status="ok", error=None, **attrs):
+    return {"name": name, "span_id": name, "start_ms": start_ms, "duration_ms": duration_ms, "status": status,
+            "error": error, "attrs": attrs, "children": list(children)}
+
+
+def test_timeline_has_lanes_waits_and_running_spans():
+    http = _span("http", 12.0, 30.0, path="/v1/quote", queued_ms=4.0, status_code=200)
+    hop = _span("hop", 10.0, 40.0, [http], src_chain=1, dst_chain=42161, src_token="0x" + "a" * 40,
+                dst_token="WBTC", executor_wait_ms=6.0, efficiency=0.99)
+    slow_hop = _span("hop", 20.0, None, src_chain=1, dst_chain=8453, src_token="WBTC", dst_token="ETH")
+    trace = _span("query", 0.0, 80.0, [
+        _span("strategy", 1.0, 60.0, [hop], strategy="direct"),
+        _span("strategy", 2.0, None, [slow_hop], strategy="via_base_direct"),
+    ])
+
+    rows = timeline(trace)
+    assert [row["start_ms"] for row in rows] == sorted(row["start_ms"] for row in rows)
+    lanes = {(row["lane"], row["kind"]) for row in rows}
+    hop_lane = "hop 1→42161 0xaaaa…aaaa→WBTC"
+    assert lanes == {
+        ("strategy direct", "strategy"), ("strategy via_base_direct", "strategy"),
+        (hop_lane, "waiting"), (hop_lane, "hop"),
+        (f"{hop_lane} · /v1/quote", "waiting"), (f"{hop_lane} · /v1/quote", "http"),
+        ("hop 1→8453 WBTC→ETH", "hop"),
+    }
+
+    waits = {row["detail"]: row for row in rows if row["kind"] == "waiting"}
+    assert (waits["waiting for an executor thread"]["start_ms"], waits["waiting for an executor thread"]["end_ms"]) == (4.0, 10.0)
+    assert (waits["rate limiter"]["start_ms"], waits["rate limiter"]["end_ms"]) == (12.0, 16.0)
+    request = next(row for row in rows if row["kind"] == "http")
+    assert (request["start_ms"], request["end_ms"]) == (16.0, 42.0)
+
+    running = [row for row in rows if row["status"] == "running"]
+    assert {row["lane"] for row in running} == {"strategy via_base_direct", "hop 1→8453 WBTC→ETH"}
+    assert {row["end_ms"] for row in running} == {80.0}
+    assert timeline(None) == []
+
+
+def test_profiled_queries_are_traced(hops):
+    with QueryProfiler("cprofile") as profiler:
+        result = find_best_routes_parallel("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+
+    assert "find_best_routes_parallel" in profiler.report()
+    strategies = {row["lane"] for row in timeline(result["trace"]) if row["kind"] == "strategy"}
+    assert strategies == {"strategy direct", "strategy native_bridge", "strategy via_base_direct",
+                          "strategy via_base_with_native"}
+    with pytest.raises(ValueError):
+        QueryProfiler("perf")
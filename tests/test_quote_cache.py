@@ -0,0 +1,45 @@
+import time
+
+from routing.route_finder import QuoteCache
+
+
+def _key(cache, amount):
+    return cache.key(1, 42161, "0xwbtc", "0xwbtc", "CHEAPEST", amount)
+
+
+def test_amounts_within_the_bucket_share_an_entry_rescaled():
+    cache = QuoteCache(bucket_width=0.01)
+    cache.put(_key(cache, 1.0), 1.0, {"expectedAmount": 0.99, "efficiency": 0.99})
+
+    assert _key(cache, 1.005) == _key(cache, 1.0)
+    quote = cache.get(_key(cache, 1.005), 1.005)
+    assert abs(quote["expectedAmount"] - 0.99 * 1.005) < 1e-12
+    assert quote["efficiency"] == 0.99
+
+    # The cached quote itself is left alone
+    assert cache.get(_key(cache, 1.0), 1.0)["expectedAmount"] == 0.99
+
+
+def test_amounts_outside_the_bucket_miss():
+    cache = QuoteCache(bucket_width=0.01)
+    cache.put(_key(cache, 1.0), 1.0, {"expectedAmount": 0.99})
+
+    assert _key(cache, 1.02) != _key(cache, 1.0)
+    assert cache.get(_key(cache, 1.02), 1.02) is None
+    assert cache.get(_key(cache, 2.0), 2.0) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_entries_expire_and_the_least_recent_is_evicted():
+    cache = QuoteCache(maxsize=2, ttl=0.05)
+    for amount in (1.0, 2.0):
+        cache.put(_key(cache, amount), amount, {"expectedAmount": amount})
+    cache.get(_key(cache, 1.0), 1.0)
+    cache.put(_key(cache, 4.0), 4.0, {"expectedAmount": 4.0})
+
+    assert cache.get(_key(cache, 2.0), 2.0) is None   # least recently used
+    assert cache.get(_key(cache, 1.0), 1.0) is not None
+    time.sleep(0.06)
+    assert cache.get(_key(cache, 4.0), 4.0) is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,242 @@
+import time
+
+import pytest
+
+from benchmarks.mock_server import ErrorModel, LatencyModel
+from routing import route_finder
+from routing.route_finder import HopUnavailable, find_best_routes_parallel, iter_best_routes, normalize_routes
+
+
+STRATEGIES = {"direct", "native_bridge", "via_base_direct", "via_base_with_native"}
+
+
+def _statuses(result):
+    return {route["type"]: route.get("status", "ok") for route in [result["best"]] + result["alternatives"]}
+
+
+def _route(*args, **kwargs):
+    return find_best_routes_parallel("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", *args, **kwargs)
+
+
+########################################
+### HOP DAG
+########################################
+
+def test_every_strategy_runs_and_shared_hops_are_quoted_once(hops):
+    result = _route()
+
+    assert result["best"]["type"] == "direct"
+    assert _statuses(result) == dict.fromkeys(STRATEGIES, "ok")
+    # native_bridge and via_base_with_native both start by swapping WBTC to ETH on Ethereum
+    assert len(hops.calls) == 9
+    assert result["stats"] == {
+        "hops_requested": 10, "unique_hops": 9, "hops_quoted": 9, "hops_requoted": 0, "calls_saved": 1,
+    }
+
+
+def test_failed_hop_fails_every_strategy_below_it(hops):
+    hops.efficiencies = {("Ethereum", "WBTC", "Ethereum", "ETH"): None}
+    result = _route()
+
+    assert result["best"]["type"] == "direct"
+    assert {alternative["type"] for alternative in result["alternatives"]} == {"via_base_direct"}
+    assert result["stats"]["hops_quoted"] == 4
+
+
+########################################
+### SPECULATIVE QUOTES
+########################################
+
+@pytest.fixture
+def prices(monkeypatch):
+    """Every token at 1 USD, so projected amounts only depend on SPECULATIVE_HOP_EFFICIENCY."""
+    monkeypatch.setattr(route_finder.token_registry, "resolve_many",
+                        lambda queries, return_exceptions=False: [("0x" + "1" * 40, 18, "1")] * len(queries))
+
+
+def test_speculative_quotes_within_tolerance_are_kept(hops, prices):
+    hops.efficiency = route_finder.SPECULATIVE_HOP_EFFICIENCY
+    exact = _route()
+    hops.calls.clear()
+    speculative = _route(speculative=True)
+
+    assert speculative["best"]["cumulativeEfficiency"] == exact["best"]["cumulativeEfficiency"]
+    assert _statuses(speculative) == _statuses(exact)
+    assert speculative["stats"]["hops_requoted"] == 0
+    assert len(hops.calls) == 9
+
+
+def test_speculative_quotes_off_the_projection_are_quoted_again(hops, prices):
+    hops.efficiency = 0.9
+    exact = _route()
+    speculative = _route(speculative=True)
+
+    assert speculative["best"]["cumulativeEfficiency"] == exact["best"]["cumulativeEfficiency"]
+    assert {alternative["efficiency"] for alternative in speculative["alternatives"]} == \
+        {alternative["efficiency"] for alternative in exact["alternatives"]}
+    assert speculative["stats"]["hops_requoted"] > 0
+
+
+########################################
+### DEADLINE AND PRUNING
+########################################
+
+def test_deadline_returns_best_so_far_and_lists_the_rest_as_timed_out(hops):
+    hops.delay = 0.15
+    started = time.perf_counter()
+    result = _route(deadline_ms=250)
+    elapsed = time.perf_counter() - started
+
+    # One hop fits in the budget, the 4-hop strategy needs 600 ms
+    assert elapsed < 0.4
+    assert result["best"]["type"] == "direct"
+    statuses = _statuses(result)
+    assert statuses["via_base_with_native"] == "timed_out"
+    assert statuses["direct"] == "ok"
+
+
+def test_deadline_with_nothing_finished_is_unavailable(hops):
+    hops.delay = 0.2
+    result = _route(deadline_ms=50)
+    assert result["type"] == "unavailable"
+    assert [alternative["status"] for alternative in result["alternatives"]] == ["timed_out"] * len(STRATEGIES)
+
+
+def test_prune_stops_strategies_that_cannot_win(hops):
+    result = _route(prune=True)
+    assert result["best"]["type"] == "direct"
+    assert "pruned" in _statuses(result).values()
+    assert result["stats"]["hops_quoted"] < 9
+
+
+########################################
+### STREAMING
+########################################
+
+def test_events_arrive_as_strategies_finish(hops):
+    hops.delay = 0.05
+    events = list(iter_best_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST"))
+
+    assert events[0]["type"] == "direct"
+    assert events[0]["best"]["type"] == "direct"
+    assert {event["type"] for event in events[:-1]} == STRATEGIES
+    assert events[-1]["done"]
+    assert events[-1]["result"]["best"]["type"] == "direct"
+
+
+def test_abandoned_query_stops_quoting(hops):
+    hops.delay = 0.05
+    events = iter_best_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST")
+    assert next(events)["type"] == "direct"
+    events.close()
+
+    time.sleep(0.2)
+    assert len(hops.calls) < 9
+
+
+########################################
+### FAILURES
+########################################
+
+def test_client_errors_do_not_open_the_circuit(lifi):
+    bad_token = "0x" + "b" * 40
+    for _ in range(route_finder.BREAKER_THRESHOLD + 1):
+        with pytest.raises(HopUnavailable):
+            route_finder.jumper_quote(1, 1, bad_token, "0x" + "1" * 40, 10 ** 18, 1, 1, "CHEAPEST", fresh=True)
+    assert not route_finder.circuit_breaker.is_open((1, 1))
+
+    result = _route(fresh=True)
+    assert _statuses(result) == dict.fromkeys(STRATEGIES, "ok")
+    assert lifi.calls["/v1/quote"] == route_finder.BREAKER_THRESHOLD + 1 + result["stats"]["hops_quoted"]
+
+
+def test_client_errors_are_negative_cached(lifi):
+    bad_token = "0x" + "b" * 40
+    for _ in range(3):
+        with pytest.raises(HopUnavailable):
+            route_finder.jumper_quote(1, 1, bad_token, "0x" + "1" * 40, 10 ** 18, 1, 1, "CHEAPEST")
+    assert lifi.calls["/v1/quote"] == 1
+
+
+def test_server_errors_open_the_circuit_and_skip_its_strategies(lifi, monkeypatch):
+    monkeypatch.setattr(route_finder, "RETRY_ATTEMPTS", 1)
+    lifi.errors = ErrorModel(error_rate=1.0)
+    pair = (1, 1)
+    for _ in range(route_finder.BREAKER_THRESHOLD):
+        with pytest.raises(HopUnavailable):
+            route_finder.jumper_quote(*pair, "0x" + "2" * 40, "0x" + "1" * 40, 10 ** 18, 1, 1, "CHEAPEST", fresh=True)
+    assert route_finder.circuit_breaker.is_open(pair)
+
+    lifi.errors = ErrorModel()
+    events = list(iter_best_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", fresh=True))
+    skipped = {event["type"] for event in events[:-1] if event["status"] == "skipped"}
+    # The strategies swapping WBTC to ETH on Ethereum go through pair (1, 1)
+    assert skipped == {"native_bridge", "via_base_with_native"}
+    assert events[-1]["result"]["best"]["type"] == "direct"
+
+
+########################################
+### MULTI-ROUTE
+########################################
+
+def _lifi_step(tool, from_chain, to_chain, from_amount, to_amount):
+    return {
+        "tool": tool,
+        "action": {
+            "fromChainId": from_chain, "toChainId": to_chain,
+            "fromToken": {"address": f"0x{from_chain:040x}", "decimals": 8, "priceUSD": "60000"},
+            "toToken": {"address": f"0x{to_chain:040x}", "decimals": 8, "priceUSD": "60000"},
+        },
+        "estimate": {"fromAmount": str(from_amount), "toAmount": str(to_amount), "executionDuration": 60},
+    }
+
+
+def test_normalize_routes_keeps_lifi_order_and_steps():
+    lifi_routes = [
+        {"steps": [_lifi_step("stargate", 1, 42161, 10 ** 8, 99 * 10 ** 6)], "tags": ["CHEAPEST"]},
+        {"steps": []},
+        {"steps": [_lifi_step("uniswap", 1, 1, 10 ** 8, 98 * 10 ** 6), _lifi_step("across", 1, 42161, 98 * 10 ** 6, 97 * 10 ** 6)]},
+    ]
+    details = {"price_from_amount": "60000", "price_to_amount": "60000"}
+    routes = normalize_routes(lifi_routes, details, 1)
+
+    assert [strategy["type"] for strategy, _ in routes] == ["lifi_route_1", "lifi_route_3"]
+    first, second = routes
+    assert first[0]["description"] == "li.quest route via stargate (cheapest)"
+    assert first[0]["plan"] == [(1, 42161, f"0x{1:040x}", f"0x{42161:040x}")]
+    assert first[1]["cumulativeEfficiency"] == "99.0000%"
+    assert [step["tool"] for step in second[1]["steps"]] == ["uniswap", "across"]
+    assert second[1]["totalTime"] == 120
+    assert second[1]["cumulativeEfficiency"] == "97.0000%"
+
+
+def test_multi_route_returns_lifi_routes(lifi):
+    result = _route(fresh=True, multi_route=True)
+    assert result["best"]["type"] == "lifi_route_1"
+    assert result["stats"]["multi_routes"] >= 1
+    assert lifi.calls["/v1/quote"] == 0
+
+
+def test_failed_multi_route_leaves_the_strategies_the_rest_of_the_budget(hops, monkeypatch):
+    def multi_routes(*args):
+        time.sleep(0.5)
+        raise HopUnavailable("No routes from chain 1 to 42161: HTTP 503")
+
+    monkeypatch.setattr(route_finder, "multi_routes", multi_routes)
+    hops.delay = 0.05
+    started = time.perf_counter()
+    result = _route(deadline_ms=300, multi_route=True)
+
+    assert time.perf_counter() - started < 0.45
+    assert result["best"]["type"] == "direct"
+    assert result["stats"]["multi_routes"] == 0
+
+
+def test_slow_multi_route_keeps_the_deadline(lifi):
+    lifi.latency = LatencyModel("fixed:1000")
+    started = time.perf_counter()
+    result = _route(fresh=True, deadline_ms=300, multi_route=True)
+
+    assert time.perf_counter() - started < 0.45
+    assert result["type"] == "unavailable"
+    assert {alternative["status"] for alternative in result["alternatives"]} == {"timed_out"}
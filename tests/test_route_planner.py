@@ -0,0 +1,56 @@
+import time
+
+from routing.route_finder import find_best_routes_parallel
+from routing.route_planner import find_best_routes_graph, plan_routes
+
+
+HUBS = [("Base", "ETH"), ("Arbitrum", "USDC")]
+
+
+def test_finds_a_better_route_through_a_hub(hops):
+    hops.efficiencies = {
+        ("Ethereum", "WBTC", "Arbitrum", "WBTC"): 0.5,
+        ("Ethereum", "WBTC", "Base", "ETH"): 0.99,
+        ("Base", "ETH", "Arbitrum", "WBTC"): 0.99,
+    }
+    result = find_best_routes_graph("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", hubs=HUBS)
+
+    assert result["best"]["type"] == "via_base_eth"
+    assert result["best"]["cumulativeEfficiency"] == "98.0100%"
+    assert "direct" in {alternative["type"] for alternative in result["alternatives"]}
+
+
+def test_stays_within_the_quote_budget(hops):
+    routes, quotes_used = plan_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", hubs=HUBS, max_quotes=5)
+    assert quotes_used == len(hops.calls) == 5
+    assert routes
+
+
+def test_failed_hops_are_left_out(hops):
+    hops.efficiencies = {("Ethereum", "WBTC", "Arbitrum", "WBTC"): None}
+    routes, _ = plan_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", hubs=HUBS)
+    assert routes
+    assert "direct" not in {strategy["type"] for strategy, _ in routes}
+
+
+def test_deadline_keeps_the_routes_found_so_far(hops):
+    hops.delay = 0.2
+    started = time.perf_counter()
+    routes, _ = plan_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", hubs=HUBS, deadline_ms=300)
+    elapsed = time.perf_counter() - started
+
+    # The direct edge lands at 200 ms, the edges queued behind it would land after the deadline
+    assert elapsed < 0.38
+    assert [strategy["type"] for strategy, _ in routes] == ["direct"]
+
+
+def test_planner_mode_of_the_route_finder_keeps_the_deadline(hops):
+    hops.delay = 1
+    started = time.perf_counter()
+    result = find_best_routes_parallel("Ethereum", "Arbitrum", "WBTC", "WBTC", 1, "CHEAPEST", deadline_ms=300,
+                                       planner=True)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5
+    assert result["type"] == "unavailable"
+    assert result["stats"]["planner_quotes"] > 0
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from routing.scheduler import FairExecutor, queued_seconds
+
+
+def test_query_never_runs_more_than_its_limit():
+    executor = FairExecutor(max_workers=8)
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def task():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    with executor.session(limit=2) as query:
+        futures = [query.submit(task) for _ in range(10)]
+    assert all(future.done() for future in futures)
+    assert peak == 2
+
+
+def test_light_query_is_not_stuck_behind_a_heavy_one():
+    executor = FairExecutor(max_workers=2)
+    heavy_done = []
+
+    def heavy(i):
+        time.sleep(0.02)
+        heavy_done.append(i)
+
+    heavy_query = executor.session(limit=2)
+    for i in range(40):
+        heavy_query.submit(heavy, i)
+    light_query = executor.session(limit=2)
+    light = light_query.submit(lambda: len(heavy_done))
+
+    # Round-robin: the light task runs on the next free worker, not after the 40 heavy ones
+    assert light.result(timeout=5) <= 4
+    heavy_query.shutdown(cancel_futures=True)
+    light_query.shutdown()
+
+
+def test_lower_priority_value_goes_first():
+    executor = FairExecutor(max_workers=1)
+    gate = threading.Event()
+    order = []
+
+    blocker = executor.session(priority=0)
+    blocker.submit(gate.wait)
+    warm = executor.session(priority=20)
+    batch = executor.session(priority=10)
+    interactive = executor.session(priority=0)
+    for i in range(2):
+        warm.submit(order.append, f"warm{i}")
+    for i in range(2):
+        batch.submit(order.append, f"batch{i}")
+    for i in range(2):
+        interactive.submit(order.append, f"interactive{i}")
+    gate.set()
+
+    for query in (blocker, warm, batch, interactive):
+        query.shutdown()
+    assert order == ["interactive0", "interactive1", "batch0", "batch1", "warm0", "warm1"]
+
+
+def test_shutdown_cancels_queued_tasks_only():
+    executor = FairExecutor(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return "finished"
+
+    query = executor.session(limit=1)
+    running = query.submit(slow)
+    queued = [query.submit(lambda: "never") for _ in range(3)]
+    started.wait()
+    query.shutdown(wait=False, cancel_futures=True)
+    release.set()
+
+    assert running.result(timeout=5) == "finished"
+    assert all(future.cancelled() for future in queued)
+    assert executor.stats()["cancelled"] == 3
+    with pytest.raises(RuntimeError):
+        query.submit(slow)
+
+
+def test_task_errors_and_queueing_delay_reach_the_caller():
+    executor = FairExecutor(max_workers=1)
+
+    def fail():
+        raise ValueError("no quote")
+
+    with executor.session() as query:
+        failed = query.submit(fail)
+        delay = query.submit(queued_seconds)
+    with pytest.raises(ValueError, match="no quote"):
+        failed.result()
+    assert delay.result() >= 0
+    assert queued_seconds() is None
+
+
+def test_idle_workers_exit():
+    executor = FairExecutor(max_workers=4, idle_timeout=0.05)
+    with executor.session() as query:
+        for _ in range(4):
+            query.submit(time.sleep, 0.01)
+    deadline = time.monotonic() + 2
+    while executor.stats()["threads"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.stats()["threads"] == 0
@@ -0,0 +1,52 @@
+from routing.route_finder import decode_routes, scale_routes
+from routing.shared_cache import SqliteQuoteCache
+
+
+def _key(cache, amount):
+    return cache.key(1, 42161, "0xwbtc", "0xwbtc", "CHEAPEST", amount)
+
+
+def test_quote_put_by_one_process_is_served_to_another(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first, second = SqliteQuoteCache(path), SqliteQuoteCache(path)
+    first.put(_key(first, 1.0), 1.0, {"expectedAmount": 0.99, "efficiency": 0.99})
+
+    quote = second.get(_key(second, 1.005), 1.005)
+    assert abs(quote["expectedAmount"] - 0.99 * 1.005) < 1e-12
+    assert second.stats()["shared_hits"] == 1
+
+    # Now in the local cache as well
+    second.get(_key(second, 1.0), 1.0)
+    assert second.stats()["shared_hits"] == 1
+    assert second.stats()["hits"] == 2
+
+
+def test_expired_rows_are_not_served(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SqliteQuoteCache(path, ttl=-1).put(("k",), 1.0, {"expectedAmount": 1.0})
+    assert SqliteQuoteCache(path).get(("k",), 1.0) is None
+
+
+def test_unusable_file_only_costs_the_shared_lookup(tmp_path):
+    cache = SqliteQuoteCache(str(tmp_path / "cache.sqlite"))
+    cache.table = "missing"
+    cache.put(("k",), 1.0, {"expectedAmount": 1.0})
+    assert cache.get(("k",), 1.0) == {"expectedAmount": 1.0}
+    assert cache.get(("other",), 1.0) is None
+    assert cache.stats()["shared_errors"] == 2
+
+
+def test_routes_come_back_with_tuples(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    strategy = {"type": "lifi_route_1", "description": "li.quest route via stargate", "min_steps": 1,
+                "plan": [(1, 42161, "0xwbtc", "0xwbtc")]}
+    route = {"steps": [{"tool": "stargate", "expectedAmount": 0.99}], "finalAmountUSD": 59400.0, "totalTime": 60,
+             "cumulativeEfficiency": "99.0000%"}
+    first = SqliteQuoteCache(path, table="routes", scale=scale_routes, decode=decode_routes)
+    second = SqliteQuoteCache(path, table="routes", scale=scale_routes, decode=decode_routes)
+    first.put(("routes",), 1.0, [(strategy, route)])
+
+    [(shared_strategy, shared_route)] = second.get(("routes",), 2.0)
+    assert shared_strategy == strategy
+    assert shared_route["steps"][0]["expectedAmount"] == 1.98
+    assert shared_route["finalAmountUSD"] == 118800.0
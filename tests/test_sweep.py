@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from routing.sweep import QuoteCurve, curve_cache, estimate_routes, sample_amounts, strategy_efficiencies, sweep_routes
+
+
+def test_sample_amounts_are_geometric():
+    assert sample_amounts(1, 100, 3) == pytest.approx([1, 10, 100])
+    assert sample_amounts(2, 2) == [2]
+    with pytest.raises(ValueError):
+        sample_amounts(0, 1)
+
+
+def test_curve_goes_through_the_samples_and_never_overshoots():
+    rng = random.Random(7)
+    for _ in range(50):
+        amounts = sorted(rng.sample(range(1, 1000), 6))
+        points = [(amount, rng.uniform(90, 100)) for amount in amounts]
+        curve = QuoteCurve(points)
+        for (a0, y0), (a1, y1) in zip(points, points[1:]):
+            assert curve(a0) == pytest.approx(y0)
+            for i in range(1, 20):
+                y = curve(a0 + (a1 - a0) * i / 20)
+                assert min(y0, y1) - 1e-9 <= y <= max(y0, y1) + 1e-9
+
+
+def test_curve_outside_of_the_samples_raises():
+    curve = QuoteCurve([(1, 99.0), (10, 98.0)])
+    assert curve.covers(5) and not curve.covers(11)
+    with pytest.raises(ValueError):
+        curve(11)
+
+
+def test_sweep_fits_one_curve_per_strategy_and_answers_estimates(hops):
+    curve_cache.clear()
+    sweep = sweep_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", sample_amounts(0.5, 2, 3), "CHEAPEST")
+
+    assert set(sweep["curves"]) == {"direct", "native_bridge", "via_base_direct", "via_base_with_native"}
+    assert sweep["curves"]["direct"](1.5) == pytest.approx(90.0)
+    estimates = estimate_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 1.5, "CHEAPEST")
+    assert estimates["via_base_with_native"] == pytest.approx(100 * 0.9 ** 4)
+    assert estimate_routes("Ethereum", "Arbitrum", "WBTC", "WBTC", 5, "CHEAPEST") is None
+
+
+def _event(route_type, tools, efficiency):
+    route = {"steps": [{"tool": tool} for tool in tools], "cumulativeEfficiency": f"{efficiency:.4f}%"}
+    return {"done": False, "type": route_type, "status": "ok", "route": route, "best": None}
+
+
+def test_lifi_routes_are_followed_by_their_tools_not_their_rank():
+    at_one = [_event("lifi_route_1", ["stargate"], 99.0), _event("lifi_route_2", ["uniswap", "across"], 98.0)]
+    at_ten = [_event("lifi_route_1", ["uniswap", "across"], 98.5), _event("lifi_route_2", ["stargate"], 97.0),
+              _event("lifi_route_3", ["stargate"], 96.0), _event("direct", ["fake"], 95.0)]
+
+    assert strategy_efficiencies(at_one) == {"li.quest via stargate": 99.0, "li.quest via uniswap → across": 98.0}
+    assert strategy_efficiencies(at_ten) == {
+        "li.quest via uniswap → across": 98.5, "li.quest via stargate": 97.0, "direct": 95.0,
+    }
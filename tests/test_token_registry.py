@@ -0,0 +1,77 @@
+import pytest
+
+from routing import route_finder
+from routing.route_finder import TokenRegistry
+
+
+WBTC = {"symbol": "WBTC", "address": "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599", "decimals": 8, "priceUSD": "60000"}
+USDC = {"symbol": "USDC", "address": "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "decimals": 6, "priceUSD": "1"}
+USDC_BRIDGED = {"symbol": "usdc", "address": "0x" + "c" * 40, "decimals": 6, "priceUSD": "0.99"}
+
+
+@pytest.fixture
+def single_lookups(monkeypatch):
+    """The /v1/token fallback, answering from a dict and recording its calls."""
+    calls = []
+    tokens = {"USDC": ("0x" + "d" * 40, 6, "1.0")}
+
+    def resolve_token(chain_id, token_input):
+        calls.append((chain_id, token_input))
+        return tokens[token_input]
+
+    monkeypatch.setattr(route_finder, "resolve_token", resolve_token)
+    return calls
+
+
+def test_lookup_by_symbol_and_address():
+    registry = TokenRegistry(refresh_interval=0)
+    registry.index_chain(1, [WBTC, USDC])
+
+    assert registry.lookup(1, "wbtc") == (WBTC["address"], 8, "60000")
+    assert registry.lookup(1, WBTC["address"].lower()) == (WBTC["address"], 8, "60000")
+    assert registry.lookup(10, "WBTC") is None
+
+
+def test_ambiguous_symbol_falls_back_to_a_single_lookup_once(single_lookups):
+    registry = TokenRegistry(refresh_interval=0)
+    registry.index_chain(1, [WBTC, USDC, USDC_BRIDGED])
+
+    # Two tokens claim USDC: the symbol is not guessed from the bulk list
+    assert registry.lookup(1, "USDC") is None
+    assert registry.lookup(1, USDC_BRIDGED["address"]) == (USDC_BRIDGED["address"], 6, "0.99")
+
+    assert registry.resolve(1, "USDC") == ("0x" + "d" * 40, 6, "1.0")
+    assert registry.resolve(1, "USDC") == ("0x" + "d" * 40, 6, "1.0")
+    assert single_lookups == [(1, "USDC")]
+
+
+def test_reindex_updates_the_prices_of_single_lookups(single_lookups):
+    registry = TokenRegistry(refresh_interval=0)
+    registry.index_chain(1, [USDC, USDC_BRIDGED])
+    registry.resolve(1, "USDC")
+
+    registry.index_chain(1, [USDC, USDC_BRIDGED, {**USDC, "address": "0x" + "d" * 40, "priceUSD": "1.01"}])
+    assert registry.lookup(1, "USDC") == ("0x" + "d" * 40, 6, "1.01")
+
+
+def test_failed_bulk_load_is_not_retried_for_a_while(single_lookups, monkeypatch):
+    registry = TokenRegistry(refresh_interval=0, load_retry=60)
+    loads = []
+
+    def fetch_chain(chain_id):
+        loads.append(chain_id)
+        raise ValueError(f"Failed to load tokens for chain {chain_id}: HTTP 503")
+
+    monkeypatch.setattr(registry, "_fetch_chain", fetch_chain)
+    for _ in range(5):
+        assert registry.resolve(1, "USDC") == ("0x" + "d" * 40, 6, "1.0")
+    with pytest.raises(ValueError, match="not retried"):
+        registry.load_chain(1)
+    assert loads == [1]
+
+    # Once the backoff is over the next call loads the list again
+    registry._failed_loads[1] = (0, "HTTP 503")
+    monkeypatch.setattr(registry, "_fetch_chain", lambda chain_id: [WBTC])
+    registry.load_chain(1)
+    assert registry.is_loaded(1)
+    assert registry.lookup(1, "WBTC") == (WBTC["address"], 8, "60000")